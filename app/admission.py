@@ -0,0 +1,122 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import settings
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class AdmissionController:
+    """
+    Admission control for the webhook path: a bounded in-flight limit,
+    latency-aware shedding driven by observed DB latency, and per-sender
+    token buckets. A limit of 0 disables the corresponding check.
+    """
+    def __init__(
+        self,
+        max_in_flight: int,
+        shed_latency_ms: float,
+        sender_rate: float,
+        sender_burst: float,
+        max_senders: int = 10000,
+        latency_alpha: float = 0.2,
+        latency_stale_s: float = 1.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.shed_latency_ms = shed_latency_ms
+        self.sender_rate = sender_rate
+        self.sender_burst = sender_burst
+        self.max_senders = max_senders
+        self.latency_alpha = latency_alpha
+        self.latency_stale_s = latency_stale_s
+
+        self.in_flight = 0
+        self.db_latency_ms = 0.0
+        self._latency_updated = 0.0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_enter(self) -> Optional[str]:
+        """
+        Reserve an in-flight slot. Returns None on success or the shed reason.
+        """
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return "shed_in_flight"
+            if self._latency_exceeded():
+                return "shed_latency"
+            self.in_flight += 1
+            return None
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _latency_exceeded(self) -> bool:
+        if not self.shed_latency_ms or self.db_latency_ms <= self.shed_latency_ms:
+            return False
+        # A stale estimate lets a probe request through so we can recover once the DB is healthy again.
+        if time.monotonic() - self._latency_updated >= self.latency_stale_s:
+            return False
+        return True
+
+    def observe_db_latency(self, latency_ms: float):
+        with self._lock:
+            if self._latency_updated == 0.0:
+                self.db_latency_ms = latency_ms
+            else:
+                self.db_latency_ms += self.latency_alpha * (latency_ms - self.db_latency_ms)
+            self._latency_updated = time.monotonic()
+
+    def allow_sender(self, msisdn: str) -> Tuple[bool, int]:
+        """
+        Take one token from the sender's bucket. Returns (allowed, retry_after_seconds).
+        """
+        if not self.sender_rate:
+            return True, 0
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(msisdn)
+            if bucket is None:
+                bucket = TokenBucket(self.sender_burst, now)
+                self._buckets[msisdn] = bucket
+                if len(self._buckets) > self.max_senders:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(msisdn)
+                bucket.tokens = min(
+                    self.sender_burst,
+                    bucket.tokens + (now - bucket.updated) * self.sender_rate
+                )
+                bucket.updated = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return True, 0
+
+            return False, max(1, math.ceil((1 - bucket.tokens) / self.sender_rate))
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.latency_stale_s))
+
+
+def build_controller() -> AdmissionController:
+    return AdmissionController(
+        max_in_flight=settings.WEBHOOK_MAX_IN_FLIGHT,
+        shed_latency_ms=settings.WEBHOOK_SHED_LATENCY_MS,
+        sender_rate=settings.SENDER_RATE_PER_SEC,
+        sender_burst=settings.SENDER_BURST,
+    )
+
+
+admission = build_controller()
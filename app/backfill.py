@@ -0,0 +1,71 @@
+import threading
+import timeit
+from typing import Callable, List, Optional
+
+from app.logging_utils import logger
+from app import storage
+
+# Wait before retrying after a failed chunk (typically the write lock held past the busy timeout).
+RETRY_INTERVAL_S = 5
+
+
+class Backfiller:
+    """
+    Runs the data backfills (`migrations.BACKFILLS`) in a background thread
+    after startup, so startup only waits for the schema migrations. Until they
+    finish some rows lack `ts_ms`, `seq` or `last_ts_ms`, so `/health/ready`
+    reports not-ready. Then runs `on_complete`, for work that needs the
+    backfilled columns.
+    """
+    def __init__(self):
+        self.running = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._on_complete: List[Callable[[], None]] = []
+
+    def start(self, on_complete: List[Callable[[], None]]):
+        if self._thread:
+            return
+        self.running = True
+        self._on_complete = on_complete
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="backfill", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        start_time = timeit.default_timer()
+        try:
+            if not self._backfill():
+                return
+            logger.info({"event": "backfill", "status": "complete", "duration_ms": round((timeit.default_timer() - start_time) * 1000, 2)})
+            for callback in self._on_complete:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error({"event": "backfill", "status": "on_complete_failed", "error": str(e)})
+        finally:
+            self.running = False
+
+    def _backfill(self) -> bool:
+        """
+        Run the backfills to completion, retrying after failures. Returns False if stopped first.
+        """
+        while not self._stop.is_set():
+            try:
+                return storage.run_backfills(self._stop)
+            except Exception as e:
+                logger.error({"event": "backfill", "status": "failed", "error": str(e)})
+                self._stop.wait(RETRY_INTERVAL_S)
+        return False
+
+    def ready(self) -> bool:
+        return not self.running
+
+
+backfiller = Backfiller()
@@ -0,0 +1,139 @@
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# Raw deflate: no zlib header, dictionary id or checksum on every row.
+WBITS = -15
+# A sample already compressing below this ratio against the dictionary adds nothing new.
+COVERED_RATIO = 0.5
+
+
+def compressor(dictionary: bytes):
+    return zlib.compressobj(zlib.Z_BEST_COMPRESSION, zlib.DEFLATED, WBITS, zdict=dictionary)
+
+
+def decompressor(dictionary: bytes):
+    return zlib.decompressobj(WBITS, zdict=dictionary)
+
+
+def compress(text: str, dictionary: bytes) -> bytes:
+    c = compressor(dictionary)
+    return c.compress(text.encode()) + c.flush()
+
+
+def decompress(data: bytes, dictionary: bytes) -> str:
+    d = decompressor(dictionary)
+    return (d.decompress(data) + d.flush()).decode()
+
+
+def train_dictionary(samples: List[str], max_bytes: int) -> bytes:
+    """
+    Build a preset dictionary from sample texts. Samples are added greedily
+    while they are poorly covered by what is already chosen, so each template
+    is represented about once. The most common samples go last: deflate
+    encodes matches near the end of the dictionary with the shortest distances.
+    """
+    counts: Dict[str, int] = {}
+    for text in samples:
+        if text:
+            counts[text] = counts.get(text, 0) + 1
+
+    chosen: List[bytes] = []
+    size = 0
+    for text in sorted(counts, key=counts.get, reverse=True):
+        data = text.encode()
+        if size + len(data) > max_bytes:
+            continue
+        if chosen and len(compress(text, b"".join(reversed(chosen)))) < len(data) * COVERED_RATIO:
+            continue
+        chosen.append(data)
+        size += len(data)
+    return b"".join(reversed(chosen))
+
+
+class TextCodec:
+    """
+    Message text compression with versioned preset dictionaries from the
+    `text_dictionaries` table. Rows store either plain `text`, or `text_z`
+    plus the `text_dict` version it was compressed with. Dictionaries never
+    change once written, so they are cached for the life of the process.
+    Priming deflate with a dictionary costs more than copying primed state,
+    so a primed compressor is kept per version; inflate is cheap to prime.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.active: Optional[Tuple[int, bytes]] = None
+        self._dictionaries: Dict[int, bytes] = {}
+        self._compressors: Dict[int, Any] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            conn = sqlite3.connect(self.path)
+            try:
+                rows = conn.execute("SELECT version, dictionary FROM text_dictionaries ORDER BY version").fetchall()
+            finally:
+                conn.close()
+            self._dictionaries.update(rows)
+            if rows:
+                self.active = rows[-1]
+            self._loaded = True
+
+    def activate(self, version: int, dictionary: bytes):
+        with self._lock:
+            self._dictionaries[version] = dictionary
+            self.active = (version, dictionary)
+
+    def dictionary(self, version: int) -> bytes:
+        if version not in self._dictionaries:
+            self.load()
+        return self._dictionaries[version]
+
+    def compressor(self, version: int):
+        primed = self._compressors.get(version)
+        if primed is None:
+            primed = self._compressors.setdefault(version, compressor(self.dictionary(version)))
+        return primed.copy()
+
+    def encode(self, text: Optional[str]) -> Tuple[Optional[str], Optional[bytes], Optional[int]]:
+        """
+        (text, text_z, text_dict) column values for a new row.
+        """
+        if not settings.TEXT_COMPRESSION_ENABLED or not text:
+            return text, None, None
+        if not self._loaded:
+            self.load()
+        if self.active is None:
+            return text, None, None
+        return self.encode_with(text, self.active[0])
+
+    def encode_with(self, text: Optional[str], version: int) -> Tuple[Optional[str], Optional[bytes], Optional[int]]:
+        if not text:
+            return text, None, None
+        raw = text.encode()
+        c = self.compressor(version)
+        data = c.compress(raw) + c.flush()
+        if len(data) >= len(raw):
+            return text, None, None
+        return None, data, version
+
+    def decode(self, text_z: Optional[bytes], version: Optional[int]) -> Optional[str]:
+        """
+        SQL function `message_text(text_z, text_dict)`; only called for compressed rows.
+        """
+        if text_z is None:
+            return None
+        return decompress(text_z, self.dictionary(version))
+
+
+_codecs: Dict[str, TextCodec] = {}
+
+def get_codec(path: str) -> TextCodec:
+    codec = _codecs.get(path)
+    if codec is None:
+        codec = _codecs.setdefault(path, TextCodec(path))
+    return codec
@@ -2,7 +2,50 @@ import os
 
 class Config:
     WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_SECRETS = os.getenv("WEBHOOK_SECRETS", "")
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:////data/app.db")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    MIGRATION_CHUNK_SIZE = int(os.getenv("MIGRATION_CHUNK_SIZE", "1000"))
+    NUMBER_CACHE_SIZE = int(os.getenv("NUMBER_CACHE_SIZE", "100000"))
+    TEXT_COMPRESSION_ENABLED = os.getenv("TEXT_COMPRESSION_ENABLED", "false").lower() in ("1", "true", "yes")
+    TEXT_DICT_SIZE = int(os.getenv("TEXT_DICT_SIZE", "32768"))
+    TEXT_DICT_SAMPLE_SIZE = int(os.getenv("TEXT_DICT_SAMPLE_SIZE", "2000"))
+    TEXT_DICT_MIN_SAMPLES = int(os.getenv("TEXT_DICT_MIN_SAMPLES", "100"))
+    TEXT_DICT_RETRAIN_S = float(os.getenv("TEXT_DICT_RETRAIN_S", "86400"))
+    TEXT_RECOMPRESS_BATCH = int(os.getenv("TEXT_RECOMPRESS_BATCH", "500"))
+    TEXT_RECOMPRESS_SLEEP_S = float(os.getenv("TEXT_RECOMPRESS_SLEEP_S", "0.05"))
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+    WARMUP_COUNTRY_CODES = os.getenv("WARMUP_COUNTRY_CODES", "1,91")
+    WARMUP_DB_ROWS = int(os.getenv("WARMUP_DB_ROWS", "10000"))
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+    SERVER_TIMING_MAX_QUERIES = int(os.getenv("SERVER_TIMING_MAX_QUERIES", "10"))
+
+    WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+    WEBHOOK_SHED_LATENCY_MS = float(os.getenv("WEBHOOK_SHED_LATENCY_MS", "500"))
+    SENDER_RATE_PER_SEC = float(os.getenv("SENDER_RATE_PER_SEC", "50"))
+    SENDER_BURST = float(os.getenv("SENDER_BURST", "100"))
+
+    WRITE_BUSY_TIMEOUT_MS = float(os.getenv("WRITE_BUSY_TIMEOUT_MS", "50"))
+    WRITE_RETRY_BASE_MS = float(os.getenv("WRITE_RETRY_BASE_MS", "5"))
+    WRITE_RETRY_MAX_MS = float(os.getenv("WRITE_RETRY_MAX_MS", "100"))
+    WRITE_RETRY_DEADLINE_MS = float(os.getenv("WRITE_RETRY_DEADLINE_MS", "2000"))
+
+    DB_MONITOR_INTERVAL_S = float(os.getenv("DB_MONITOR_INTERVAL_S", "5"))
+    DB_DEGRADED_LATENCY_MS = float(os.getenv("DB_DEGRADED_LATENCY_MS", "100"))
+    DB_UNREADY_LATENCY_MS = float(os.getenv("DB_UNREADY_LATENCY_MS", "1000"))
+
+    STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "1000"))
+    STREAM_HEARTBEAT_S = float(os.getenv("STREAM_HEARTBEAT_S", "15"))
+    STREAM_REPLAY_PAGE_SIZE = int(os.getenv("STREAM_REPLAY_PAGE_SIZE", "500"))
+
+    DEBUG_ENDPOINTS_ENABLED = os.getenv("DEBUG_ENDPOINTS_ENABLED", "false").lower() in ("1", "true", "yes")
+    DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+
+    RECENT_BUFFER_SIZE = int(os.getenv("RECENT_BUFFER_SIZE", "5000"))
+
+    READ_SNAPSHOT_ENABLED = os.getenv("READ_SNAPSHOT_ENABLED", "false").lower() in ("1", "true", "yes")
+    READ_SNAPSHOT_PATH = os.getenv("READ_SNAPSHOT_PATH", "")
+    READ_SNAPSHOT_INTERVAL_S = float(os.getenv("READ_SNAPSHOT_INTERVAL_S", "30"))
 
 settings = Config()
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+import timeit
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.logging_utils import logger
+from app import metrics
+from app import storage
+
+
+class DBMonitor:
+    """
+    Background DB health monitor. Probes round-trip latency on a schedule,
+    exports SQLite file/WAL gauges and serves readiness from the cached probe.
+    """
+    def __init__(self, interval_s: float, degraded_latency_ms: float, unready_latency_ms: float):
+        self.interval_s = interval_s
+        self.degraded_latency_ms = degraded_latency_ms
+        self.unready_latency_ms = unready_latency_ms
+
+        self.ok: Optional[bool] = None
+        self.latency_ms: Optional[float] = None
+        self.sampled_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            try:
+                self.collect()
+            except Exception as e:
+                logger.warning({"event": "db_monitor", "status": "collect_failed", "error": str(e)})
+            self._stop.wait(self.interval_s)
+
+    def probe(self) -> bool:
+        start_time = timeit.default_timer()
+        try:
+            with storage.get_db_connection() as conn:
+                conn.execute("SELECT 1").fetchone()
+            ok = True
+        except Exception as e:
+            if storage.is_busy_error(e):
+                metrics.DB_BUSY_TOTAL.labels(operation="probe").inc()
+            logger.warning({"event": "db_probe", "status": "failed", "error": str(e)})
+            ok = False
+
+        self.latency_ms = (timeit.default_timer() - start_time) * 1000
+        self.ok = ok
+        self.sampled_at = time.monotonic()
+        metrics.DB_PROBE_LATENCY_MS.observe(self.latency_ms)
+        return ok
+
+    def collect(self):
+        db_path = storage.db_path
+        metrics.DB_FILE_SIZE_BYTES.set(os.path.getsize(db_path) if os.path.exists(db_path) else 0)
+
+        with storage.get_db_connection() as conn:
+            # SQLite removes the WAL when the last connection closes, so it is measured with this one open.
+            wal_path = db_path + "-wal"
+            metrics.DB_WAL_SIZE_BYTES.set(os.path.getsize(wal_path) if os.path.exists(wal_path) else 0)
+            metrics.DB_PAGE_COUNT.set(conn.execute("PRAGMA page_count").fetchone()[0])
+            metrics.DB_FREELIST_PAGES.set(conn.execute("PRAGMA freelist_count").fetchone()[0])
+
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                start_time = timeit.default_timer()
+                busy = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()[0]
+                metrics.DB_CHECKPOINT_SECONDS.observe(timeit.default_timer() - start_time)
+                if busy:
+                    metrics.DB_BUSY_TOTAL.labels(operation="checkpoint").inc()
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        DB readiness as one of "ready", "degraded" or "not_ready".
+        Falls back to an on-demand probe when the cached sample is missing or stale.
+        """
+        if self.ok is None or time.monotonic() - self.sampled_at > 3 * self.interval_s:
+            self.probe()
+
+        if not self.ok or self.latency_ms > self.unready_latency_ms:
+            state = "not_ready"
+        elif self.latency_ms > self.degraded_latency_ms:
+            state = "degraded"
+        else:
+            state = "ready"
+        return {"state": state, "latency_ms": round(self.latency_ms, 2)}
+
+
+db_monitor = DBMonitor(
+    interval_s=settings.DB_MONITOR_INTERVAL_S,
+    degraded_latency_ms=settings.DB_DEGRADED_LATENCY_MS,
+    unready_latency_ms=settings.DB_UNREADY_LATENCY_MS,
+)
@@ -1,60 +1,64 @@
+import asyncio
 import hmac
-import hashlib
-import time
 import timeit
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from fastapi import FastAPI, Request, HTTPException, Depends, Header, Response, status, Query
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.exceptions import RequestValidationError
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from app.config import settings
-from app.models import WebhookPayload, MessageResponse
+from app.models import WebhookPayload, MessageResponse, ChangeResponse
 from app import storage
 from app.logging_utils import logger
 from app import metrics
+from app.admission import admission
+from app.signing import get_registry
+from app.snapshot import read_snapshot
+from app.db_monitor import db_monitor
+from app.recompress import text_recompressor
+from app.warmup import warmup
+from app.backfill import backfiller
+from app.pubsub import broker
+from app.profiler import SamplingProfiler, ProfilerBusy, describe_tasks
+from app.middleware import RequestInstrumentationMiddleware
 
 app = FastAPI(title="Webhook API")
+app.add_middleware(RequestInstrumentationMiddleware)
+profiler = SamplingProfiler(interval_s=settings.PROFILE_INTERVAL_MS / 1000)
 
 @app.on_event("startup")
 def startup_event():
     try:
-        if not settings.WEBHOOK_SECRET:
-            logger.error("WEBHOOK_SECRET is not set.")
-        storage.init_db()
+        # Data backfills run in the background; readiness waits for them.
+        storage.init_db(backfill=False)
+        if not get_registry().keys:
+            logger.error("WEBHOOK_SECRET or WEBHOOK_SECRETS is not set.")
+        read_snapshot.start(storage.db_path)
+        db_monitor.start()
+        # Both rely on backfilled `ts_ms` / `seq`.
+        backfiller.start(on_complete=[storage.preload_recent, text_recompressor.start])
+        warmup.start()
         logger.info({"event": "startup", "status": "success"})
     except Exception as e:
         logger.error({"event": "startup", "status": "failed", "error": str(e)})
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    request_id = request.headers.get("X-Request-ID", str(time.time()))
-    start_time = timeit.default_timer()
-    
-    response = await call_next(request)
-    
-    latency_ms = (timeit.default_timer() - start_time) * 1000
-    
-    metrics.HTTP_REQUESTS_TOTAL.labels(
-        path=request.url.path, 
-        status=response.status_code
-    ).inc()
-    metrics.REQUEST_LATENCY_MS.observe(latency_ms)
-
-    log_data = {
-        "request_id": request_id,
-        "method": request.method,
-        "path": request.url.path,
-        "status": response.status_code,
-        "latency_ms": round(latency_ms, 2)
-    }
-    logger.info(log_data, extra=log_data)
-    
-    return response
+@app.on_event("shutdown")
+def shutdown_event():
+    read_snapshot.stop()
+    db_monitor.stop()
+    backfiller.stop()
+    text_recompressor.stop()
 
-async def verify_signature(request: Request, x_signature: str = Header(None)):
-    if not settings.WEBHOOK_SECRET:
+async def verify_signature(
+    request: Request,
+    x_signature: str = Header(None),
+    x_signature_key_id: Optional[str] = Header(None)
+):
+    registry = get_registry()
+    if not registry.keys:
         metrics.WEBHOOK_REQUESTS_TOTAL.labels(result="invalid_signature").inc()
         raise HTTPException(status_code=503, detail="Server misconfiguration")
 
@@ -64,29 +68,63 @@ async def verify_signature(request: Request, x_signature: str = Header(None)):
         raise HTTPException(status_code=401, detail="invalid signature")
 
     body_bytes = await request.body()
-    
-    computed_sig = hmac.new(
-        key=settings.WEBHOOK_SECRET.encode(),
-        msg=body_bytes,
-        digestmod=hashlib.sha256
-    ).hexdigest()
-
-    if not hmac.compare_digest(computed_sig, x_signature):
-        logger.warning({"event": "auth_failure", "reason": "signature_mismatch"})
+
+    valid, key_id = registry.verify(body_bytes, x_signature, x_signature_key_id)
+    if not valid:
+        logger.warning({"event": "auth_failure", "reason": "signature_mismatch", "key_id": key_id})
         metrics.WEBHOOK_REQUESTS_TOTAL.labels(result="invalid_signature").inc()
         raise HTTPException(status_code=401, detail="invalid signature")
 
     return True
 
+async def admit_webhook():
+    reason = admission.try_enter()
+    if reason:
+        logger.warning({"event": "load_shed", "reason": reason, "in_flight": admission.in_flight})
+        metrics.WEBHOOK_REQUESTS_TOTAL.labels(result=reason).inc()
+        raise HTTPException(
+            status_code=429,
+            detail="too many requests",
+            headers={"Retry-After": str(admission.retry_after())}
+        )
+    try:
+        yield
+    finally:
+        admission.leave()
+
 @app.post("/webhook", status_code=200)
 async def webhook_endpoint(
     payload: WebhookPayload, 
     request: Request,
+    admitted: None = Depends(admit_webhook),
     verified: bool = Depends(verify_signature)
 ):
-    inserted, error_msg = storage.store_message(payload)
+    allowed, retry_after = admission.allow_sender(payload.from_msisdn)
+    if not allowed:
+        logger.warning({"event": "rate_limited", "from": payload.from_msisdn})
+        metrics.WEBHOOK_REQUESTS_TOTAL.labels(result="rate_limited").inc()
+        raise HTTPException(
+            status_code=429,
+            detail="too many requests",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    request_id = getattr(request.state, "request_id", "unknown")
+
+    db_start = timeit.default_timer()
+    try:
+        inserted, error_msg = await run_in_threadpool(storage.store_message, payload)
+    except storage.StorageBusyError as e:
+        metrics.WEBHOOK_REQUESTS_TOTAL.labels(result="db_busy").inc()
+        logger.warning({"event": "db_busy", "request_id": request_id, "message_id": payload.message_id, "error": str(e)})
+        raise HTTPException(
+            status_code=503,
+            detail="database busy",
+            headers={"Retry-After": "1"}
+        )
+    finally:
+        admission.observe_db_latency((timeit.default_timer() - db_start) * 1000)
     
-    request_id = request.headers.get("X-Request-ID", "unknown")
     extra_log = {
         "request_id": request_id,
         "message_id": payload.message_id,
@@ -101,6 +139,7 @@ async def webhook_endpoint(
         if error_msg:
              metrics.WEBHOOK_REQUESTS_TOTAL.labels(result="error").inc()
              logger.error(f"Storage error: {error_msg}", extra=extra_log)
+             raise HTTPException(status_code=500, detail="storage error")
         else:
              metrics.WEBHOOK_REQUESTS_TOTAL.labels(result="duplicate").inc()
              extra_log["result"] = "duplicate"
@@ -108,8 +147,14 @@ async def webhook_endpoint(
     
     return {"status": "ok"}
 
+def set_snapshot_headers(response: Response):
+    age = read_snapshot.age_seconds()
+    if age is not None:
+        response.headers["X-Snapshot-Age-Seconds"] = f"{age:.3f}"
+
 @app.get("/messages")
 def list_messages(
+    response: Response,
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
     from_msisdn: Optional[str] = Query(None, alias="from"), 
@@ -119,7 +164,11 @@ def list_messages(
     """
     List messages with pagination and filtering.
     """
-    raw_data, total = storage.get_messages(limit, offset, from_msisdn, since, q)
+    set_snapshot_headers(response)
+    try:
+        raw_data, total = storage.get_messages(limit, offset, from_msisdn, since, q)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be an ISO-8601 timestamp")
     
     data = [
         MessageResponse.model_validate(dict(row)).model_dump(by_alias=True) 
@@ -133,8 +182,151 @@ def list_messages(
         "offset": offset
     }
 
+@app.get("/messages/changes")
+def list_changes(
+    after_seq: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Messages in ingest order after `after_seq`. Pass `next_seq` back as `after_seq` to continue.
+    """
+    rows = storage.get_messages_after(after_seq, None, limit)
+    data = [ChangeResponse.model_validate(dict(row)).model_dump(by_alias=True) for row in rows]
+
+    return {
+        "data": data,
+        "next_seq": rows[-1]["seq"] if rows else after_seq,
+        "limit": limit
+    }
+
+def format_sse(seq: int, message: Dict[str, Any]) -> str:
+    data = MessageResponse.model_validate(message).model_dump_json(by_alias=True)
+    return f"id: {seq}\nevent: message\ndata: {data}\n\n"
+
+async def message_stream(request: Request, from_msisdn: Optional[str], last_event_id: Optional[int]) -> AsyncIterator[str]:
+    """
+    Subscribe first, then replay anything after Last-Event-ID from the DB, then
+    follow the live feed, skipping live events the replay already covered.
+    """
+    subscriber = broker.subscribe(from_msisdn)
+    reason = "client_closed"
+    try:
+        replayed_upto = None
+        if last_event_id is not None:
+            replayed_upto = last_event_id
+            page_size = settings.STREAM_REPLAY_PAGE_SIZE
+            while True:
+                rows = await run_in_threadpool(storage.get_messages_after, replayed_upto, from_msisdn, page_size)
+                for row in rows:
+                    replayed_upto = row["seq"]
+                    yield format_sse(row["seq"], dict(row))
+                if len(rows) < page_size:
+                    break
+
+        while True:
+            while subscriber.buffer:
+                event = subscriber.buffer.popleft()
+                if replayed_upto is not None and event["seq"] <= replayed_upto:
+                    continue
+                yield format_sse(event["seq"], event)
+
+            if subscriber.overflowed:
+                reason = "slow_consumer"
+                yield "event: overflow\ndata: {}\n\n"
+                return
+
+            subscriber.wakeup.clear()
+            try:
+                await asyncio.wait_for(subscriber.wakeup.wait(), settings.STREAM_HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(subscriber)
+        metrics.STREAM_DISCONNECTS_TOTAL.labels(reason=reason).inc()
+
+@app.get("/messages/stream")
+async def stream_messages(
+    request: Request,
+    from_msisdn: Optional[str] = Query(None, alias="from"),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events feed of newly stored messages.
+    """
+    resume_from = None
+    if last_event_id:
+        try:
+            resume_from = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid Last-Event-ID")
+
+    return StreamingResponse(
+        message_stream(request, from_msisdn, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def parse_cursor(cursor: Optional[str], types: Tuple[type, ...]):
+    if not cursor:
+        return None
+    try:
+        return storage.decode_cursor(cursor, types)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+@app.get("/conversations")
+def list_conversations(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    List conversations with their latest message, most recently active first.
+    """
+    rows, next_cursor = storage.get_conversations(limit, parse_cursor(cursor, (int, str, str)))
+
+    data = [
+        {
+            "participants": [row["party_a"], row["party_b"]],
+            "message_count": row["message_count"],
+            "last_message": MessageResponse.model_validate(dict(row)).model_dump(by_alias=True),
+        }
+        for row in rows
+    ]
+
+    return {
+        "data": data,
+        "limit": limit,
+        "next_cursor": storage.encode_cursor(next_cursor) if next_cursor else None
+    }
+
+@app.get("/conversations/{a}/{b}/messages")
+def list_conversation_messages(
+    a: str,
+    b: str,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    List the thread between two numbers in either direction, oldest first.
+    """
+    rows, next_cursor = storage.get_conversation_messages(a, b, limit, parse_cursor(cursor, (int, str)))
+
+    data = [
+        MessageResponse.model_validate(dict(row)).model_dump(by_alias=True)
+        for row in rows
+    ]
+
+    return {
+        "data": data,
+        "limit": limit,
+        "next_cursor": storage.encode_cursor(next_cursor) if next_cursor else None
+    }
+
 @app.get("/stats")
-def get_stats():
+def get_stats(response: Response):
+    set_snapshot_headers(response)
     return storage.get_stats()
 
 @app.get("/health/live")
@@ -143,14 +335,44 @@ def health_live():
 
 @app.get("/health/ready")
 def health_ready(response: Response):
-    db_ready = storage.check_db_ready()
-    secret_ready = bool(settings.WEBHOOK_SECRET)
+    db = db_monitor.readiness()
+    db_ready = db["state"] != "not_ready"
+    secret_ready = bool(get_registry().keys)
+    warmed_up = warmup.ready()
+    backfilled = backfiller.ready()
     
-    if db_ready and secret_ready:
+    if db_ready and secret_ready and warmed_up and backfilled:
+        if db["state"] == "degraded":
+            return {"status": "degraded", "db_latency_ms": db["latency_ms"]}
         return {"status": "ready"}
     
     response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-    return {"status": "not_ready", "db": db_ready, "secret": secret_ready}
+    return {
+        "status": "not_ready", "db": db_ready, "secret": secret_ready, "warmup": warmed_up, "backfill": backfilled,
+        "db_latency_ms": db["latency_ms"]
+    }
+
+def require_debug(x_debug_token: Optional[str] = Header(None)):
+    if not settings.DEBUG_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.DEBUG_TOKEN and not (x_debug_token and hmac.compare_digest(x_debug_token.encode(), settings.DEBUG_TOKEN.encode())):
+        raise HTTPException(status_code=403, detail="forbidden")
+
+@app.get("/debug/profile", dependencies=[Depends(require_debug)])
+async def debug_profile(seconds: float = Query(10, gt=0, le=60)):
+    """
+    Sample all thread stacks for `seconds` and return collapsed (flamegraph) stacks.
+    """
+    try:
+        output = await run_in_threadpool(profiler.profile, seconds)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="profile already running")
+    return PlainTextResponse(output)
+
+@app.get("/debug/tasks", dependencies=[Depends(require_debug)])
+async def debug_tasks():
+    tasks = describe_tasks()
+    return {"count": len(tasks), "tasks": tasks}
 
 @app.get("/metrics")
 def metrics_endpoint():
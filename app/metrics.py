@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 HTTP_REQUESTS_TOTAL = Counter(
     "http_requests_total",
@@ -12,8 +12,124 @@ WEBHOOK_REQUESTS_TOTAL = Counter(
     ["result"]
 )
 
+WEBHOOK_SIGNATURE_TOTAL = Counter(
+    "webhook_signature_verifications_total",
+    "Webhook signature verification outcomes per signing key",
+    ["key_id", "result"]
+)
+
 REQUEST_LATENCY_MS = Histogram(
     "request_latency_ms",
     "Request latency in milliseconds",
     buckets=(10, 50, 100, 200, 500, 1000, float("inf"))
 )
+
+READ_SNAPSHOT_AGE_SECONDS = Gauge(
+    "read_snapshot_age_seconds",
+    "Staleness of the read snapshot serving analytics reads (-1 when reads go to the primary DB)"
+)
+
+READ_SNAPSHOT_REFRESH_SECONDS = Histogram(
+    "read_snapshot_refresh_seconds",
+    "Duration of read snapshot refreshes in seconds",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, float("inf"))
+)
+
+READ_SNAPSHOT_REFRESH_TOTAL = Counter(
+    "read_snapshot_refresh_total",
+    "Read snapshot refresh outcomes",
+    ["result"]
+)
+
+DB_PROBE_LATENCY_MS = Histogram(
+    "db_probe_latency_ms",
+    "DB round-trip latency measured by the health monitor in milliseconds",
+    buckets=(1, 5, 10, 50, 100, 500, 1000, float("inf"))
+)
+
+DB_FILE_SIZE_BYTES = Gauge(
+    "db_file_size_bytes",
+    "Size of the SQLite database file in bytes"
+)
+
+DB_WAL_SIZE_BYTES = Gauge(
+    "db_wal_size_bytes",
+    "Size of the SQLite WAL file in bytes"
+)
+
+DB_PAGE_COUNT = Gauge(
+    "db_page_count",
+    "Number of pages in the SQLite database"
+)
+
+DB_FREELIST_PAGES = Gauge(
+    "db_freelist_pages",
+    "Number of unused pages in the SQLite database"
+)
+
+DB_CHECKPOINT_SECONDS = Histogram(
+    "db_checkpoint_seconds",
+    "Duration of passive WAL checkpoints in seconds",
+    buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, float("inf"))
+)
+
+DB_BUSY_TOTAL = Counter(
+    "db_busy_total",
+    "SQLite busy/locked errors by operation",
+    ["operation"]
+)
+
+DB_SLOW_QUERIES_TOTAL = Counter(
+    "db_slow_queries_total",
+    "Statements slower than SLOW_QUERY_MS"
+)
+
+DB_WRITE_RETRIES_TOTAL = Counter(
+    "db_write_retries_total",
+    "Message writes retried after a busy/locked error"
+)
+
+DB_LOCK_WAIT_MS = Histogram(
+    "db_lock_wait_ms",
+    "Time a message write spent waiting on the database lock in milliseconds",
+    buckets=(0, 5, 10, 50, 100, 500, 1000, 2000, float("inf"))
+)
+
+STREAM_SUBSCRIBERS = Gauge(
+    "stream_subscribers",
+    "Number of connected /messages/stream subscribers"
+)
+
+STREAM_DISCONNECTS_TOTAL = Counter(
+    "stream_disconnects_total",
+    "Message stream disconnects by reason",
+    ["reason"]
+)
+
+RECENT_BUFFER_QUERIES_TOTAL = Counter(
+    "recent_buffer_queries_total",
+    "/messages queries answered from the in-memory recent buffer (hit) or SQLite (miss)",
+    ["result"]
+)
+
+TEXT_DICTIONARY_VERSION = Gauge(
+    "text_dictionary_version",
+    "Active text compression dictionary version (0 when none)"
+)
+
+TEXT_RECOMPRESSED_TOTAL = Counter(
+    "text_recompressed_total",
+    "Rows rewritten by the text re-compression job"
+)
+
+WARMUP_STEP_SECONDS = Gauge(
+    "warmup_step_seconds",
+    "Duration of each startup warm-up step",
+    ["step"]
+)
+
+STARTUP_IMPORT_SECONDS = Gauge(
+    "startup_import_seconds",
+    "Time to import each lazily loaded module preloaded during warm-up",
+    ["module"]
+)
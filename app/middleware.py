@@ -0,0 +1,92 @@
+import logging
+import time
+import timeit
+
+from app.logging_utils import logger
+from app import metrics
+from app.tracing import QueryTrace, current_trace
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Pure ASGI request instrumentation: request-ID propagation, latency,
+    HTTP metrics, per-request query tracing (`Server-Timing`) and access
+    logging. Only `http.response.start` is intercepted; bodies and
+    `receive` pass through untouched.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = timeit.default_timer()
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None:
+            request_id = str(time.time())
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        # Threadpool calls run in a copy of this context and append to the same trace.
+        trace = QueryTrace(request_id)
+        token = current_trace.set(trace)
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                latency_ms = (timeit.default_timer() - start_time) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1")),
+                    (b"server-timing", trace.server_timing(latency_ms).encode("latin-1")),
+                ]
+                self.record(scope, request_id, message["status"], latency_ms, trace)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not started:
+                latency_ms = (timeit.default_timer() - start_time) * 1000
+                self.record(scope, request_id, 500, latency_ms, trace)
+            raise
+        finally:
+            current_trace.reset(token)
+
+    @staticmethod
+    def route_label(scope) -> str:
+        """
+        The matched route's template (`/conversations/{a}/{b}/messages`), so
+        path parameters don't create a series per value. Unmatched paths share one label.
+        """
+        route = scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    @classmethod
+    def record(cls, scope, request_id: str, status_code: int, latency_ms: float, trace: QueryTrace):
+        metrics.HTTP_REQUESTS_TOTAL.labels(
+            path=cls.route_label(scope),
+            status=status_code
+        ).inc()
+        metrics.REQUEST_LATENCY_MS.observe(latency_ms)
+
+        log_data = {
+            "request_id": request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "latency_ms": round(latency_ms, 2),
+            "db_queries": len(trace.queries),
+            "db_ms": round(trace.total_ms, 2)
+        }
+        logger.info(log_data, extra=log_data)
+
+        if trace.queries and logger.isEnabledFor(logging.DEBUG):
+            trace_data = {"event": "query_trace", "request_id": request_id, "queries": trace.summary()}
+            logger.debug(trace_data, extra=trace_data)
@@ -0,0 +1,357 @@
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from app.logging_utils import logger
+from app.models import iso_to_epoch_ms
+
+
+def initial_schema(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id TEXT PRIMARY KEY,
+            from_msisdn TEXT NOT NULL,
+            to_msisdn TEXT NOT NULL,
+            ts TEXT NOT NULL,
+            text TEXT,
+            created_at TEXT NOT NULL
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_from ON messages(from_msisdn);")
+
+
+def conversations(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_from_to_ts
+        ON messages(from_msisdn, to_msisdn, ts, message_id);
+    """)
+
+    has_conversations = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            party_a TEXT NOT NULL,
+            party_b TEXT NOT NULL,
+            message_count INTEGER NOT NULL,
+            last_message_id TEXT NOT NULL,
+            last_ts TEXT NOT NULL,
+            PRIMARY KEY (party_a, party_b)
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_last
+        ON conversations(last_ts, party_a, party_b);
+    """)
+    if not has_conversations:
+        conn.execute("""
+            INSERT INTO conversations (party_a, party_b, message_count, last_message_id, last_ts)
+            SELECT party_a, party_b, message_count, message_id, ts
+            FROM (
+                SELECT
+                    MIN(from_msisdn, to_msisdn) AS party_a,
+                    MAX(from_msisdn, to_msisdn) AS party_b,
+                    COUNT(*) OVER pair AS message_count,
+                    ROW_NUMBER() OVER (pair ORDER BY ts DESC, message_id DESC) AS rn,
+                    message_id,
+                    ts
+                FROM messages
+                WINDOW pair AS (PARTITION BY MIN(from_msisdn, to_msisdn), MAX(from_msisdn, to_msisdn))
+            )
+            WHERE rn = 1
+        """)
+
+
+def messages_filter_indexes(conn: sqlite3.Connection):
+    """
+    One index per `get_messages` filter shape, each ending in the (ts, message_id)
+    sort key so results come out in order and the `from`/`since` counts are index-only.
+    The single-column indexes are prefixes of these and are dropped.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts_id ON messages(ts, message_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_from_ts_id ON messages(from_msisdn, ts, message_id);")
+    conn.execute("DROP INDEX IF EXISTS idx_messages_ts;")
+    conn.execute("DROP INDEX IF EXISTS idx_messages_from;")
+
+
+def epoch_ms_columns(conn: sqlite3.Connection):
+    """
+    Integer epoch-millisecond copies of `ts` and `created_at` for indexing and
+    comparisons. The ISO TEXT columns stay as the API representation.
+    Existing rows are filled by `backfill_epoch_ms`.
+    """
+    conn.execute("ALTER TABLE messages ADD COLUMN ts_ms INTEGER;")
+    conn.execute("ALTER TABLE messages ADD COLUMN created_at_ms INTEGER;")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts_ms ON messages(ts_ms, message_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_from_ts_ms ON messages(from_msisdn, ts_ms, message_id);")
+    conn.execute("DROP INDEX IF EXISTS idx_messages_ts_id;")
+    conn.execute("DROP INDEX IF EXISTS idx_messages_from_ts_id;")
+
+
+def require_free_space(conn: sqlite3.Connection, factor: float):
+    """
+    Fail before a table rebuild rather than part way through it: the new copy
+    goes to the WAL first, so the disk must hold `factor` times the DB again.
+    """
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not path:
+        return
+    db_bytes = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+    free_bytes = shutil.disk_usage(os.path.dirname(path)).free
+    if free_bytes < db_bytes * factor:
+        raise RuntimeError(
+            f"migration needs {db_bytes * factor / 1e6:.0f} MB free next to {path}, {free_bytes / 1e6:.0f} MB available"
+        )
+
+
+def dictionary_encoded_numbers(conn: sqlite3.Connection):
+    """
+    Move sender/recipient numbers into a `numbers` dictionary table and rebuild
+    `messages` with integer `from_id`/`to_id` references. Rowids are preserved
+    because they are the ingest positions used by the message stream.
+
+    SQLite cannot relax the old NOT NULL number columns in place, so this is
+    one rebuild under the write lock, before the API starts serving: about
+    10 us per message (2 s for 200k in `benchmarks/bench_msisdn_encoding.py`),
+    with a WAL peaking at about 1.4x the database file.
+    """
+    require_free_space(conn, factor=2.0)
+    conn.execute("""
+        CREATE TABLE numbers (
+            id INTEGER PRIMARY KEY,
+            msisdn TEXT NOT NULL UNIQUE
+        );
+    """)
+    conn.execute("""
+        INSERT INTO numbers (msisdn)
+        SELECT from_msisdn FROM messages UNION SELECT to_msisdn FROM messages
+    """)
+    conn.execute("""
+        CREATE TABLE messages_new (
+            message_id TEXT PRIMARY KEY,
+            from_id INTEGER NOT NULL REFERENCES numbers(id),
+            to_id INTEGER NOT NULL REFERENCES numbers(id),
+            ts TEXT NOT NULL,
+            text TEXT,
+            created_at TEXT NOT NULL,
+            ts_ms INTEGER,
+            created_at_ms INTEGER
+        );
+    """)
+    conn.execute("""
+        INSERT INTO messages_new (rowid, message_id, from_id, to_id, ts, text, created_at, ts_ms, created_at_ms)
+        SELECT m.rowid, m.message_id, nf.id, nt.id, m.ts, m.text, m.created_at, m.ts_ms, m.created_at_ms
+        FROM messages m
+        JOIN numbers nf ON nf.msisdn = m.from_msisdn
+        JOIN numbers nt ON nt.msisdn = m.to_msisdn
+        ORDER BY m.rowid
+    """)
+    conn.execute("DROP TABLE messages;")
+    conn.execute("ALTER TABLE messages_new RENAME TO messages;")
+    conn.execute("CREATE INDEX idx_messages_ts_ms ON messages(ts_ms, message_id);")
+    conn.execute("CREATE INDEX idx_messages_from_ts_ms ON messages(from_id, ts_ms, message_id);")
+    conn.execute("CREATE INDEX idx_messages_from_to_ts ON messages(from_id, to_id, ts, message_id);")
+
+
+def ingest_sequence(conn: sqlite3.Connection):
+    """
+    Add an explicit ingest sequence number. Unlike the implicit rowid it is
+    never renumbered by VACUUM. Existing rows get `seq = rowid` (see
+    `backfill_ingest_seq`), so stream event ids issued before stay valid.
+    """
+    conn.execute("ALTER TABLE messages ADD COLUMN seq INTEGER;")
+    conn.execute("CREATE UNIQUE INDEX idx_messages_seq ON messages(seq);")
+
+
+def compressed_text(conn: sqlite3.Connection):
+    """
+    Versioned zlib preset dictionaries, and per-row columns for compressed
+    text. `recompressed_seq` records how far the re-compression pass for a
+    dictionary version has got, so it resumes after a restart.
+    """
+    conn.execute("""
+        CREATE TABLE text_dictionaries (
+            version INTEGER PRIMARY KEY,
+            dictionary BLOB NOT NULL,
+            created_at TEXT NOT NULL,
+            recompressed_seq INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("ALTER TABLE messages ADD COLUMN text_z BLOB;")
+    conn.execute("ALTER TABLE messages ADD COLUMN text_dict INTEGER;")
+
+
+def conversation_ts_ms(conn: sqlite3.Connection):
+    """
+    Order conversations and threads by integer `ts_ms` instead of ISO TEXT,
+    which misorders timestamps whose fractional seconds differ in length
+    ("10:00:00.500Z" sorts before "10:00:00Z"). Existing conversations get
+    `last_ts_ms` (and their latest message re-picked) from `backfill_conversation_ts_ms`.
+    """
+    conn.execute("ALTER TABLE conversations ADD COLUMN last_ts_ms INTEGER;")
+    conn.execute("CREATE INDEX idx_conversations_last_ms ON conversations(last_ts_ms, party_a, party_b);")
+    conn.execute("DROP INDEX IF EXISTS idx_conversations_last;")
+    conn.execute("DROP INDEX IF EXISTS idx_messages_from_to_ts;")
+    conn.execute("CREATE INDEX idx_messages_from_to_ts ON messages(from_id, to_id, ts_ms, message_id);")
+
+def to_epoch_ms_or_zero(value: str) -> int:
+    try:
+        return iso_to_epoch_ms(value)
+    except (TypeError, ValueError):
+        logger.warning({"event": "backfill", "status": "unparseable_timestamp", "value": value})
+        return 0
+
+
+def backfill_epoch_ms(conn: sqlite3.Connection, chunk_size: int) -> int:
+    """
+    Fill one chunk of rows missing `ts_ms` in its own short transaction.
+    Returns the number of rows updated; 0 means the backfill is complete.
+    Resumable because it only ever selects rows that are still NULL.
+    """
+    rows = conn.execute(
+        "SELECT rowid, ts, created_at FROM messages WHERE ts_ms IS NULL LIMIT ?",
+        (chunk_size,)
+    ).fetchall()
+    if not rows:
+        return 0
+    conn.executemany(
+        "UPDATE messages SET ts_ms = ?, created_at_ms = ? WHERE rowid = ?",
+        [(to_epoch_ms_or_zero(ts), to_epoch_ms_or_zero(created_at), rowid) for rowid, ts, created_at in rows]
+    )
+    conn.commit()
+    return len(rows)
+
+
+def backfill_ingest_seq(conn: sqlite3.Connection, chunk_size: int) -> int:
+    """
+    Number one chunk of rows missing `seq`, in rowid (ingest) order.
+    Returns the number of rows updated; 0 means the backfill is complete.
+    """
+    cursor = conn.execute(
+        """
+        UPDATE messages SET seq = rowid
+        WHERE rowid IN (SELECT rowid FROM messages WHERE seq IS NULL ORDER BY rowid LIMIT ?)
+        """,
+        (chunk_size,)
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def backfill_conversation_ts_ms(conn: sqlite3.Connection, chunk_size: int) -> int:
+    """
+    Re-pick the latest message by (ts_ms, message_id) for one chunk of
+    conversations missing `last_ts_ms`, in one write transaction so a
+    concurrent insert can't slip in between the read and the update.
+    Needs `ts_ms`, so it runs after `backfill_epoch_ms`.
+    Returns the number of conversations updated; 0 means the backfill is complete.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            """
+            SELECT c.rowid, c.last_ts, na.id, nb.id
+            FROM conversations c
+            JOIN numbers na ON na.msisdn = c.party_a
+            JOIN numbers nb ON nb.msisdn = c.party_b
+            WHERE c.last_ts_ms IS NULL
+            LIMIT ?
+            """,
+            (chunk_size,)
+        ).fetchall()
+        for rowid, last_ts, id_a, id_b in rows:
+            latest = conn.execute(
+                """
+                SELECT message_id, ts, ts_ms FROM messages WHERE from_id = ? AND to_id = ?
+                UNION ALL
+                SELECT message_id, ts, ts_ms FROM messages WHERE from_id = ? AND to_id = ?
+                ORDER BY ts_ms DESC, message_id DESC LIMIT 1
+                """,
+                (id_a, id_b, id_b, id_a)
+            ).fetchone()
+            if latest is None:
+                conn.execute(
+                    "UPDATE conversations SET last_ts_ms = ? WHERE rowid = ?",
+                    (to_epoch_ms_or_zero(last_ts), rowid)
+                )
+                continue
+            conn.execute(
+                "UPDATE conversations SET last_message_id = ?, last_ts = ?, last_ts_ms = ? WHERE rowid = ?",
+                (*latest, rowid)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "initial_schema", initial_schema),
+    (2, "conversations", conversations),
+    (3, "messages_filter_indexes", messages_filter_indexes),
+    (4, "epoch_ms_columns", epoch_ms_columns),
+    (5, "dictionary_encoded_numbers", dictionary_encoded_numbers),
+    (6, "ingest_sequence", ingest_sequence),
+    (7, "compressed_text", compressed_text),
+    (8, "conversation_ts_ms", conversation_ts_ms),
+]
+
+# Data backfills run after the schema migrations, in chunks that each commit,
+# so writers are never locked out for more than one chunk.
+BACKFILLS: List[Tuple[str, Callable[[sqlite3.Connection, int], int]]] = [
+    ("epoch_ms", backfill_epoch_ms),
+    ("ingest_seq", backfill_ingest_seq),
+    ("conversation_ts_ms", backfill_conversation_ts_ms),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, chunk_size: int = 1000, backfill: bool = True):
+    """
+    Apply pending migrations in order. Each one runs in its own transaction
+    together with the bump of `PRAGMA user_version`. Pending backfills are
+    then resumed chunk by chunk, unless `backfill` is False and the caller
+    runs `run_backfills` itself.
+    """
+    current = get_version(conn)
+    for version, name, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN")
+        try:
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info({"event": "migration", "version": version, "name": name})
+
+    if backfill:
+        run_backfills(conn, chunk_size)
+
+
+def run_backfills(conn: sqlite3.Connection, chunk_size: int, stop: Optional[threading.Event] = None) -> bool:
+    """
+    Resume each pending backfill chunk by chunk. Returns False if `stop` was set before they all finished.
+    """
+    for name, backfill in BACKFILLS:
+        total = 0
+        while True:
+            if stop is not None and stop.is_set():
+                return False
+            updated = backfill(conn, chunk_size)
+            if not updated:
+                break
+            total += updated
+        if total:
+            logger.info({"event": "backfill", "name": name, "rows": total})
+    return True
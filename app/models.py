@@ -1,9 +1,32 @@
 import re
 from typing import Optional
 import phonenumbers
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field, field_validator, ValidationInfo, ConfigDict
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Python < 3.11 `fromisoformat` only takes 3- or 6-digit fractions and no "Z".
+FRACTION = re.compile(r"(\d{2}:\d{2}:\d{2})\.(\d+)")
+
+def parse_iso(value: str) -> datetime:
+    """
+    `datetime.fromisoformat` with a trailing "Z" and any fraction length (padded
+    or truncated to microseconds), so every supported Python parses alike.
+    """
+    value = FRACTION.sub(lambda m: f"{m.group(1)}.{m.group(2)[:6]:0<6}", value, count=1)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def iso_to_epoch_ms(value: str) -> int:
+    """
+    Convert an ISO-8601 timestamp to epoch milliseconds (naive values are UTC,
+    sub-millisecond precision is truncated). Raises ValueError if unparseable.
+    """
+    dt = parse_iso(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
 class WebhookPayload(BaseModel):
     message_id: str = Field(..., min_length=1)
     from_msisdn: str = Field(..., alias="from")
@@ -32,7 +55,7 @@ class WebhookPayload(BaseModel):
         if not v.endswith("Z"):
             raise ValueError("Timestamp must be UTC ISO-8601 ending with 'Z'")
         try:
-            datetime.fromisoformat(v.replace("Z", "+00:00"))
+            parse_iso(v)
         except ValueError:
             raise ValueError("Invalid ISO-8601 timestamp")
         return v
@@ -44,4 +67,7 @@ class MessageResponse(BaseModel):
     ts: str
     text: Optional[str] = None
     
-    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+class ChangeResponse(MessageResponse):
+    seq: int
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def frame_label(code, cache: Dict[Any, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        cache[code] = label
+    return label
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler over all threads, including the one running the
+    event loop. Runs in the calling (worker) thread; only one profile may run
+    at a time.
+    """
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float) -> str:
+        """
+        Sample for `seconds` and return collapsed stacks (`thread;outer;...;inner count`).
+        Raises ProfilerBusy if another profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            return self._sample(seconds)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float) -> str:
+        own_ident = threading.get_ident()
+        labels: Dict[Any, str] = {}
+        thread_names: Dict[int, str] = {}
+        stacks: Counter = Counter()
+
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in thread_names:
+                    thread_names.update((t.ident, t.name) for t in threading.enumerate())
+
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code, labels))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval_s)
+
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def describe_tasks(limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Pending asyncio tasks on the running loop with their suspended stacks.
+    """
+    labels: Dict[Any, str] = {}
+    tasks = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        tasks.append({
+            "name": task.get_name(),
+            "coro": getattr(coro, "__qualname__", repr(coro)),
+            "stack": [frame_label(frame.f_code, labels) for frame in task.get_stack(limit=limit)],
+        })
+    return sorted(tasks, key=lambda t: t["name"])
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Set
+
+from app.config import settings
+from app import metrics
+
+
+class Subscriber:
+    """
+    A bounded per-subscriber buffer owned by one event loop. Once the buffer
+    is full the subscriber is marked overflowed and receives nothing more;
+    the stream then disconnects it and the client resumes via Last-Event-ID.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, from_msisdn: Optional[str], max_buffer: int):
+        self.loop = loop
+        self.from_msisdn = from_msisdn
+        self.max_buffer = max_buffer
+        self.buffer: deque = deque()
+        self.wakeup = asyncio.Event()
+        self.overflowed = False
+
+    def offer(self, event: Dict[str, Any]):
+        if self.overflowed:
+            return
+        if len(self.buffer) >= self.max_buffer:
+            self.overflowed = True
+        else:
+            self.buffer.append(event)
+        self.wakeup.set()
+
+
+class Broker:
+    """
+    In-process pub/sub for stored messages. `publish` may be called from any
+    thread; delivery is handed to each subscriber's event loop.
+    """
+    def __init__(self, max_buffer: int):
+        self.max_buffer = max_buffer
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, from_msisdn: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), from_msisdn, self.max_buffer)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        metrics.STREAM_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+        metrics.STREAM_SUBSCRIBERS.dec()
+
+    def publish(self, event: Dict[str, Any]):
+        with self._lock:
+            if not self._subscribers:
+                return
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            if subscriber.from_msisdn and subscriber.from_msisdn != event["from_msisdn"]:
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # The subscriber's loop is closed; nothing will ever drain it.
+                self.unsubscribe(subscriber)
+
+
+broker = Broker(max_buffer=settings.STREAM_BUFFER_SIZE)
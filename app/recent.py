@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+Key = Tuple[int, str]
+
+# SQLite's LIKE is case-insensitive for ASCII letters only.
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+class RecentMessage:
+    """
+    Compact record with the read interface of `sqlite3.Row` (`keys()` and item access).
+    """
+    __slots__ = ("message_id", "from_msisdn", "to_msisdn", "ts", "text", "ts_ms")
+    FIELDS = __slots__
+
+    def __init__(self, message_id: str, from_msisdn: str, to_msisdn: str, ts: str, text: Optional[str], ts_ms: int):
+        self.message_id = message_id
+        self.from_msisdn = from_msisdn
+        self.to_msisdn = to_msisdn
+        self.ts = ts
+        self.text = text
+        self.ts_ms = ts_ms
+
+    def keys(self):
+        return self.FIELDS
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+
+class RecentBuffer:
+    """
+    The most recently stored messages, kept sorted by (ts_ms, message_id) with a
+    per-sender secondary index. `floor` is the highest (ts_ms, message_id) that is
+    in the DB but not in the buffer; a `since` window strictly above it is
+    complete in memory. Only valid while this process is the only writer.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.loaded = False
+        self.floor: Optional[Key] = None
+
+        self._records: Dict[Key, RecentMessage] = {}
+        self._order: deque = deque()
+        self._sorted: List[Key] = []
+        self._by_sender: Dict[str, List[Key]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, records: List[RecentMessage], complete: bool):
+        """
+        Replace the contents with `records` (newest by ts). `complete` means the DB holds nothing else.
+        Records `add`ed before the first load are kept: the preload runs in the background
+        while writes are accepted, and may have read the DB before they committed.
+        """
+        with self._lock:
+            if not self.loaded:
+                records = records + list(self._records.values())
+            self._records.clear()
+            self._order.clear()
+            self._sorted.clear()
+            self._by_sender.clear()
+            self.floor = None
+
+            for record in sorted(records, key=lambda r: (r.ts_ms, r.message_id)):
+                self._insert(record)
+            if not complete and self._sorted:
+                self.floor = self._sorted[0]
+            self.loaded = True
+
+    def add(self, record: RecentMessage):
+        if not self.capacity:
+            return
+        with self._lock:
+            self._insert(record)
+
+    def _insert(self, record: RecentMessage):
+        key = (record.ts_ms, record.message_id)
+        if key in self._records:
+            return
+        self._records[key] = record
+        self._order.append(key)
+        insort(self._sorted, key)
+        insort(self._by_sender.setdefault(record.from_msisdn, []), key)
+
+        if len(self._order) > self.capacity:
+            self._evict(self._order.popleft())
+
+    def _evict(self, key: Key):
+        record = self._records.pop(key)
+        del self._sorted[bisect_left(self._sorted, key)]
+        sender_keys = self._by_sender[record.from_msisdn]
+        del sender_keys[bisect_left(sender_keys, key)]
+        if not sender_keys:
+            del self._by_sender[record.from_msisdn]
+        if self.floor is None or key > self.floor:
+            self.floor = key
+
+    def query(
+        self, limit: int, offset: int, from_msisdn: Optional[str], since_ms: Optional[int], q: Optional[str]
+    ) -> Optional[Tuple[List[RecentMessage], int]]:
+        """
+        Answer a `get_messages` query from memory, or return None if the buffer cannot answer it exactly.
+        """
+        if not self.loaded or (q and ("%" in q or "_" in q)):
+            return None
+
+        with self._lock:
+            if self.floor is not None and not (since_ms is not None and since_ms > self.floor[0]):
+                return None
+
+            keys = self._by_sender.get(from_msisdn, []) if from_msisdn else self._sorted
+            start = bisect_left(keys, (since_ms,)) if since_ms is not None else 0
+            records = [self._records[key] for key in keys[start:]]
+
+        if q:
+            needle = q.translate(ASCII_LOWER)
+            records = [r for r in records if r.text is not None and needle in r.text.translate(ASCII_LOWER)]
+
+        return records[offset:offset + limit], len(records)
+
+
+recent_buffer = RecentBuffer(capacity=settings.RECENT_BUFFER_SIZE)
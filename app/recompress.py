@@ -0,0 +1,176 @@
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.compression import compress, train_dictionary
+from app.config import settings
+from app.logging_utils import logger
+from app.models import iso_to_epoch_ms
+from app import metrics
+from app import storage
+
+# How often the job wakes up to look for a retrain or rows written since the last pass.
+CHECK_INTERVAL_S = 60
+# A retrained dictionary is only adopted if it shrinks the sample by at least this much.
+RETRAIN_MIN_GAIN = 0.05
+
+
+class TextRecompressor:
+    """
+    Background job for message text compression. Trains a preset dictionary
+    from the most recent messages once enough exist, retrains every
+    `retrain_s` seconds, and rewrites rows stored under an older dictionary
+    (or uncompressed) in small batches, each in its own short transaction.
+    """
+    def __init__(
+        self, enabled: bool, retrain_s: float, sample_size: int, min_samples: int,
+        dict_size: int, batch_size: int, batch_sleep_s: float
+    ):
+        self.enabled = enabled
+        self.retrain_s = retrain_s
+        self.sample_size = sample_size
+        self.min_samples = min_samples
+        self.dict_size = dict_size
+        self.batch_size = batch_size
+        self.batch_sleep_s = batch_sleep_s
+
+        self.trained_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="text-recompressor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.due_for_training():
+                    self.train()
+                self.recompress()
+            except Exception as e:
+                logger.error({"event": "text_recompress", "status": "failed", "error": str(e)})
+            self._stop.wait(CHECK_INTERVAL_S)
+
+    def due_for_training(self) -> bool:
+        codec = storage.text_codec()
+        codec.load()
+        if codec.active is None:
+            return True
+        if self.trained_at is None:
+            with storage.get_db_connection() as conn:
+                created_at = conn.execute(
+                    "SELECT created_at FROM text_dictionaries WHERE version = ?", (codec.active[0],)
+                ).fetchone()[0]
+            self.trained_at = iso_to_epoch_ms(created_at) / 1000
+        return bool(self.retrain_s) and time.time() - self.trained_at >= self.retrain_s
+
+    def train(self) -> Optional[int]:
+        """
+        Train a dictionary from recent messages and make it active. Returns the
+        new version, or None if there are too few samples or no real gain.
+        """
+        codec = storage.text_codec()
+        with storage.get_db_connection() as conn:
+            rows = conn.execute(
+                f"SELECT {storage.MESSAGE_TEXT} FROM messages m ORDER BY m.seq DESC LIMIT ?",
+                (self.sample_size,)
+            ).fetchall()
+        samples = [row[0] for row in rows if row[0]]
+        if len(samples) < self.min_samples:
+            return None
+
+        dictionary = train_dictionary(samples, self.dict_size)
+        self.trained_at = time.time()
+        if codec.active is not None:
+            current = sum(len(compress(text, codec.active[1])) for text in samples)
+            candidate = sum(len(compress(text, dictionary)) for text in samples)
+            if candidate > current * (1 - RETRAIN_MIN_GAIN):
+                logger.info({"event": "text_dictionary", "status": "kept", "version": codec.active[0]})
+                return None
+
+        with storage.get_db_connection() as conn:
+            version = conn.execute(
+                "INSERT INTO text_dictionaries (dictionary, created_at) VALUES (?, ?) RETURNING version",
+                (dictionary, datetime.utcnow().isoformat() + "Z")
+            ).fetchall()[0][0]
+            conn.commit()
+        codec.activate(version, dictionary)
+        logger.info({"event": "text_dictionary", "status": "trained", "version": version, "bytes": len(dictionary)})
+        return version
+
+    def recompress(self) -> int:
+        """
+        Rewrite rows after the active dictionary's `recompressed_seq` that are
+        not stored with it yet. Returns the number of rows rewritten.
+        """
+        codec = storage.text_codec()
+        if codec.active is None:
+            return 0
+        version = codec.active[0]
+
+        total = 0
+        with storage.get_db_connection() as conn:
+            after = conn.execute(
+                "SELECT recompressed_seq FROM text_dictionaries WHERE version = ?", (version,)
+            ).fetchone()[0]
+            upto = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM messages").fetchone()[0]
+
+            while after < upto and not self._stop.is_set() and codec.active[0] == version:
+                rows = conn.execute(
+                    "SELECT seq, text, text_z, text_dict FROM messages WHERE seq > ? AND seq <= ? ORDER BY seq LIMIT ?",
+                    (after, upto, self.batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+
+                updates = []
+                for seq, text, text_z, text_dict in rows:
+                    if text_dict == version:
+                        continue
+                    if text_z is not None:
+                        text = codec.decode(text_z, text_dict)
+                    text, new_z, new_dict = codec.encode_with(text, version)
+                    if new_z is None and text_z is None:
+                        continue
+                    updates.append((text, new_z, new_dict, seq))
+
+                after = rows[-1]["seq"]
+                conn.executemany("UPDATE messages SET text = ?, text_z = ?, text_dict = ? WHERE seq = ?", updates)
+                conn.execute("UPDATE text_dictionaries SET recompressed_seq = ? WHERE version = ?", (after, version))
+                conn.commit()
+
+                total += len(updates)
+                metrics.TEXT_RECOMPRESSED_TOTAL.inc(len(updates))
+                self._stop.wait(self.batch_sleep_s)
+
+        if total:
+            logger.info({"event": "text_recompress", "version": version, "rows": total})
+        return total
+
+
+text_recompressor = TextRecompressor(
+    enabled=settings.TEXT_COMPRESSION_ENABLED,
+    retrain_s=settings.TEXT_DICT_RETRAIN_S,
+    sample_size=settings.TEXT_DICT_SAMPLE_SIZE,
+    min_samples=settings.TEXT_DICT_MIN_SAMPLES,
+    dict_size=settings.TEXT_DICT_SIZE,
+    batch_size=settings.TEXT_RECOMPRESS_BATCH,
+    batch_sleep_s=settings.TEXT_RECOMPRESS_SLEEP_S,
+)
+
+def _dictionary_version_metric() -> float:
+    active = storage.text_codec().active
+    return 0.0 if active is None else active[0]
+
+metrics.TEXT_DICTIONARY_VERSION.set_function(_dictionary_version_metric)
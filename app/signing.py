@@ -0,0 +1,99 @@
+import hmac
+import hashlib
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.logging_utils import logger
+from app import metrics
+
+DEFAULT_KEY_ID = "default"
+
+
+class SigningKey:
+    __slots__ = ("key_id", "_state", "valid_total")
+
+    def __init__(self, key_id: str, secret: str):
+        self.key_id = key_id
+        self.valid_total = metrics.WEBHOOK_SIGNATURE_TOTAL.labels(key_id=key_id, result="valid")
+        # Keyed state (inner/outer pads) is computed once here; each request only pays for .copy().
+        self._state = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+    def hexdigest(self, body: bytes) -> str:
+        mac = self._state.copy()
+        mac.update(body)
+        return mac.hexdigest()
+
+    def matches(self, body: bytes, signature: str) -> bool:
+        # `signature` must be ASCII; `KeyRegistry.verify` checks that once per request.
+        return hmac.compare_digest(self.hexdigest(body), signature)
+
+
+class KeyRegistry:
+    """
+    Ordered set of active webhook secrets. The primary `WEBHOOK_SECRET` comes first,
+    followed by `WEBHOOK_SECRETS` entries (comma separated, `key_id:secret`).
+    Malformed entries are logged and skipped.
+    """
+    def __init__(self, keys: List[SigningKey]):
+        self.keys = keys
+        self._by_id = {key.key_id: key for key in keys}
+
+    @classmethod
+    def from_config(cls, primary: str, extra: str) -> "KeyRegistry":
+        keys = []
+        if primary:
+            keys.append(SigningKey(DEFAULT_KEY_ID, primary))
+        for entry in extra.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            key_id, sep, secret = entry.partition(":")
+            if not sep or not key_id or not secret:
+                # One bad entry must not take the other keys (or startup) down with it.
+                logger.error({"event": "signing_key", "status": "invalid", "key_id": key_id if sep else None})
+                continue
+            keys.append(SigningKey(key_id, secret))
+        return cls(keys)
+
+    def verify(self, body: bytes, signature: str, key_id: Optional[str] = None) -> Tuple[bool, str]:
+        """
+        Verify `signature` against the selected key, or each active key in order.
+        Returns (valid, key_id) and records the outcome per key.
+        """
+        if key_id:
+            key = self._by_id.get(key_id)
+            if key is None:
+                metrics.WEBHOOK_SIGNATURE_TOTAL.labels(key_id="unknown", result="unknown_key").inc()
+                return False, key_id
+            candidates = [key]
+        else:
+            candidates = self.keys
+
+        matched = None
+        if signature.isascii():
+            for key in candidates:
+                if key.matches(body, signature):
+                    matched = key
+                    break
+
+        if matched is None:
+            metrics.WEBHOOK_SIGNATURE_TOTAL.labels(key_id=key_id or "any", result="mismatch").inc()
+            return False, key_id or ""
+        matched.valid_total.inc()
+        return True, matched.key_id
+
+
+_registry: Optional[KeyRegistry] = None
+_registry_source: Optional[Tuple[str, str]] = None
+
+
+def get_registry() -> KeyRegistry:
+    """
+    Return the registry for the current settings, rebuilding it only when the configured secrets change.
+    """
+    global _registry, _registry_source
+    source = (settings.WEBHOOK_SECRET, settings.WEBHOOK_SECRETS)
+    if _registry is None or source != _registry_source:
+        _registry = KeyRegistry.from_config(*source)
+        _registry_source = source
+    return _registry
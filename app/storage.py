@@ -1,11 +1,25 @@
 import sqlite3
 import os
+import threading
+import json
+import base64
+import random
+import time
+import timeit
+from pathlib import Path
 from contextlib import contextmanager
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 
 from app.config import settings
-from app.models import WebhookPayload
+from app.models import WebhookPayload, iso_to_epoch_ms
+from app import migrations
+from app.snapshot import read_snapshot
+from app import metrics
+from app.pubsub import broker
+from app.recent import recent_buffer, RecentMessage
+from app.tracing import TracingConnection
+from app.compression import get_codec, TextCodec
 
 db_path = settings.DATABASE_URL.replace("sqlite:///", "")
 if settings.DATABASE_URL.startswith("sqlite:////"):
@@ -13,76 +27,335 @@ if settings.DATABASE_URL.startswith("sqlite:////"):
 elif settings.DATABASE_URL.startswith("sqlite:///"):
     db_path = settings.DATABASE_URL[10:]
 
+class StorageBusyError(Exception):
+    """
+    The write could not acquire the database lock before the retry deadline.
+    """
+
+# Held across insert, commit and publish, so live stream events go out in `seq` order.
+# Without it two threadpool writers can commit N, N+1 and publish N+1, N, and a client
+# resuming from N+1 would never see N.
+write_lock = threading.Lock()
+
 @contextmanager
-def get_db_connection():
-    conn = sqlite3.connect(db_path)
+def get_db_connection(timeout: float = 5.0):
+    conn = sqlite3.connect(db_path, timeout=timeout, factory=TracingConnection)
     conn.row_factory = sqlite3.Row
+    conn.create_function("message_text", 2, text_codec().decode, deterministic=True)
     try:
         yield conn
     finally:
         conn.close()
 
-def init_db():
+def is_busy_error(e: Exception) -> bool:
+    message = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+@contextmanager
+def get_read_connection():
+    """
+    Connection for analytics reads: the read snapshot when one is available, otherwise the primary DB.
+    """
+    snapshot_path = read_snapshot.current_path()
+    if snapshot_path is None:
+        with get_db_connection() as conn:
+            yield conn
+        return
+
+    conn = sqlite3.connect(Path(snapshot_path).resolve().as_uri() + "?mode=ro", uri=True, factory=TracingConnection)
+    conn.row_factory = sqlite3.Row
+    conn.create_function("message_text", 2, text_codec().decode, deterministic=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def text_codec() -> TextCodec:
+    return get_codec(db_path)
+
+def init_db(backfill: bool = True):
+    """
+    Create or migrate the schema. With `backfill=False` pending data backfills
+    are left to `run_backfills` (the API runs them in the background).
+    """
     dir_name = os.path.dirname(db_path)
     if dir_name and not os.path.exists(dir_name):
         os.makedirs(dir_name, exist_ok=True)
 
     with get_db_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                message_id TEXT PRIMARY KEY,
-                from_msisdn TEXT NOT NULL,
-                to_msisdn TEXT NOT NULL,
-                ts TEXT NOT NULL,
-                text TEXT,
-                created_at TEXT NOT NULL
-            );
-        """)
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts);")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_from ON messages(from_msisdn);")
+        # Persistent: readers no longer block the writer, and the monitor's WAL/checkpoint metrics apply.
+        conn.execute("PRAGMA journal_mode=WAL")
+        migrations.migrate(conn, chunk_size=settings.MIGRATION_CHUNK_SIZE, backfill=backfill)
+
+def run_backfills(stop: Optional[threading.Event] = None) -> bool:
+    with get_db_connection() as conn:
+        return migrations.run_backfills(conn, settings.MIGRATION_CHUNK_SIZE, stop)
+
+# Message text, decompressed only for rows that are actually output or filtered on.
+# COALESCE short-circuits, so plain rows never call into Python.
+MESSAGE_TEXT = "COALESCE(m.text, message_text(m.text_z, m.text_dict))"
+
+# Read-side projection restoring the external shape from the `numbers` dictionary.
+MESSAGE_COLUMNS = f"""
+    m.message_id, nf.msisdn AS from_msisdn, nt.msisdn AS to_msisdn, m.ts, {MESSAGE_TEXT} AS text, m.created_at, m.ts_ms
+"""
+MESSAGE_JOINS = "JOIN numbers nf ON nf.id = m.from_id JOIN numbers nt ON nt.id = m.to_id"
+
+# msisdn -> numbers.id, per database file. Only committed IDs are cached; IDs never change.
+_number_caches: Dict[str, Dict[str, int]] = {}
+
+def number_cache() -> Dict[str, int]:
+    cache = _number_caches.setdefault(db_path, {})
+    if len(cache) >= settings.NUMBER_CACHE_SIZE:
+        cache.clear()
+    return cache
+
+def lookup_number_id(conn: sqlite3.Connection, msisdn: str) -> Optional[int]:
+    """
+    ID of a known number, or None if no message has used it yet.
+    """
+    cache = number_cache()
+    number_id = cache.get(msisdn)
+    if number_id is None:
+        row = conn.execute("SELECT id FROM numbers WHERE msisdn = ?", (msisdn,)).fetchone()
+        if row is None:
+            return None
+        number_id = cache[msisdn] = row[0]
+    return number_id
+
+def ensure_number_id(conn: sqlite3.Connection, msisdn: str) -> int:
+    """
+    ID of `msisdn`, adding it inside the caller's write transaction if new.
+    The caller caches the ID once the transaction commits.
+    """
+    number_id = number_cache().get(msisdn)
+    if number_id is not None:
+        return number_id
+    conn.execute("INSERT OR IGNORE INTO numbers (msisdn) VALUES (?)", (msisdn,))
+    return conn.execute("SELECT id FROM numbers WHERE msisdn = ?", (msisdn,)).fetchone()[0]
+
+def conversation_key(msisdn_1: str, msisdn_2: str) -> Tuple[str, str]:
+    """
+    Conversations are keyed by the unordered pair of participants.
+    """
+    return (msisdn_1, msisdn_2) if msisdn_1 <= msisdn_2 else (msisdn_2, msisdn_1)
+
+def update_conversation(conn: sqlite3.Connection, payload: WebhookPayload, ts_ms: int):
+    party_a, party_b = conversation_key(payload.from_msisdn, payload.to_msisdn)
+    # Every SET expression sees the row before the update, so the comparison is repeated per column.
+    conn.execute(
+        """
+        INSERT INTO conversations (party_a, party_b, message_count, last_message_id, last_ts, last_ts_ms)
+        VALUES (?, ?, 1, ?, ?, ?)
+        ON CONFLICT (party_a, party_b) DO UPDATE SET
+            message_count = message_count + 1,
+            last_message_id = CASE
+                WHEN (excluded.last_ts_ms, excluded.last_message_id) > (last_ts_ms, last_message_id)
+                THEN excluded.last_message_id ELSE last_message_id END,
+            last_ts = CASE
+                WHEN (excluded.last_ts_ms, excluded.last_message_id) > (last_ts_ms, last_message_id)
+                THEN excluded.last_ts ELSE last_ts END,
+            last_ts_ms = MAX(excluded.last_ts_ms, last_ts_ms)
+        """,
+        (party_a, party_b, payload.message_id, payload.ts, ts_ms)
+    )
+
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> List[Any]:
+    """
+    Decode an opaque keyset cursor whose values have `types`. Raises ValueError if it is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if (
+        not isinstance(values, list) or len(values) != len(types)
+        or not all(type(v) is t for v, t in zip(values, types))
+    ):
+        raise ValueError("invalid cursor")
+    return values
+
+def insert_message(payload: WebhookPayload) -> int:
+    """
+    Insert the message and update its conversation in one transaction. Returns the row's ingest sequence number.
+    `seq` is assigned under the write lock, so sequence order is also commit order. It also stays above every
+    rowid, so it can't collide with `backfill_ingest_seq` (`seq = rowid`) running in the background.
+    """
+    with get_db_connection(timeout=settings.WRITE_BUSY_TIMEOUT_MS / 1000) as conn:
+        now = datetime.utcnow().isoformat() + "Z"
+        ts_ms = iso_to_epoch_ms(payload.ts)
+        from_id = ensure_number_id(conn, payload.from_msisdn)
+        to_id = ensure_number_id(conn, payload.to_msisdn)
+        text, text_z, text_dict = text_codec().encode(payload.text)
+        cursor = conn.execute(
+            """
+            INSERT INTO messages (message_id, from_id, to_id, ts, text, text_z, text_dict, created_at, ts_ms, created_at_ms, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, MAX(
+                (SELECT COALESCE(MAX(seq), 0) FROM messages), (SELECT COALESCE(MAX(rowid), 0) FROM messages)
+            ) + 1)
+            RETURNING seq
+            """,
+            (
+                payload.message_id, from_id, to_id, payload.ts, text, text_z, text_dict, now,
+                ts_ms, iso_to_epoch_ms(now)
+            )
+        )
+        seq = cursor.fetchall()[0][0]
+        update_conversation(conn, payload, ts_ms)
         conn.commit()
 
+        cache = number_cache()
+        cache[payload.from_msisdn] = from_id
+        cache[payload.to_msisdn] = to_id
+        return seq
+
 def store_message(payload: WebhookPayload) -> Tuple[bool, str]:
     """
     Store message. Returns (inserted: bool, error: str)
+    Lock contention is retried with jittered exponential backoff; raises
+    StorageBusyError once `WRITE_RETRY_DEADLINE_MS` would be exceeded.
+    Each attempt holds `write_lock` until the stored message is published.
     """
-    try:
-        with get_db_connection() as conn:
-            now = datetime.utcnow().isoformat() + "Z"
-            conn.execute(
-                """
-                INSERT INTO messages (message_id, from_msisdn, to_msisdn, ts, text, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (payload.message_id, payload.from_msisdn, payload.to_msisdn, payload.ts, payload.text, now)
-            )
-            conn.commit()
-            return True, ""
-    except sqlite3.IntegrityError:
-        return False, ""
-    except Exception as e:
-        return False, str(e)
+    start_time = timeit.default_timer()
+    deadline = start_time + settings.WRITE_RETRY_DEADLINE_MS / 1000
+    attempt = 0
+    while True:
+        attempt_start = timeit.default_timer()
+        if not write_lock.acquire(timeout=max(deadline - attempt_start, 0)):
+            metrics.DB_BUSY_TOTAL.labels(operation="write").inc()
+            metrics.DB_LOCK_WAIT_MS.observe((timeit.default_timer() - start_time) * 1000)
+            raise StorageBusyError("write lock not acquired before the retry deadline")
+        try:
+            seq = insert_message(payload)
+            publish_stored(payload, seq)
+            break
+        except sqlite3.IntegrityError:
+            return False, ""
+        except Exception as e:
+            error = e
+        finally:
+            write_lock.release()
 
-def get_messages(limit: int, offset: int, from_msisdn: Optional[str], since: Optional[str], q: Optional[str]) -> Tuple[List[sqlite3.Row], int]:
-    base_query = "FROM messages WHERE 1=1"
+        if not is_busy_error(error):
+            return False, str(error)
+
+        metrics.DB_BUSY_TOTAL.labels(operation="write").inc()
+        cap_ms = min(settings.WRITE_RETRY_MAX_MS, settings.WRITE_RETRY_BASE_MS * 2 ** attempt)
+        backoff = random.uniform(0, cap_ms) / 1000
+        now = timeit.default_timer()
+        if now + backoff >= deadline:
+            metrics.DB_LOCK_WAIT_MS.observe((now - start_time) * 1000)
+            raise StorageBusyError(str(error))
+
+        attempt += 1
+        metrics.DB_WRITE_RETRIES_TOTAL.inc()
+        time.sleep(backoff)
+
+    metrics.DB_LOCK_WAIT_MS.observe((attempt_start - start_time) * 1000)
+    return True, ""
+
+def publish_stored(payload: WebhookPayload, seq: int):
+    recent_buffer.add(RecentMessage(
+        payload.message_id, payload.from_msisdn, payload.to_msisdn, payload.ts, payload.text, iso_to_epoch_ms(payload.ts)
+    ))
+    broker.publish({
+        "seq": seq,
+        "message_id": payload.message_id,
+        "from_msisdn": payload.from_msisdn,
+        "to_msisdn": payload.to_msisdn,
+        "ts": payload.ts,
+        "text": payload.text,
+    })
+
+def build_messages_query(from_id: Optional[int], since: Optional[str], q: Optional[str]) -> Tuple[str, str, List[Any]]:
+    """
+    Build the (count_query, data_query, params) for a `get_messages` filter combination.
+    The data query additionally takes LIMIT and OFFSET parameters.
+    Raises ValueError if `since` is not an ISO-8601 timestamp.
+    """
+    where = "WHERE 1=1"
     params = []
 
-    if from_msisdn:
-        base_query += " AND from_msisdn = ?"
-        params.append(from_msisdn)
+    if from_id is not None:
+        where += " AND m.from_id = ?"
+        params.append(from_id)
     
     if since:
-        base_query += " AND ts >= ?"
-        params.append(since)
+        where += " AND m.ts_ms >= ?"
+        params.append(iso_to_epoch_ms(since))
         
     if q:
-        base_query += " AND text LIKE ?"
+        where += f" AND {MESSAGE_TEXT} LIKE ?"
         params.append(f"%{q}%")
 
-    count_query = f"SELECT COUNT(*) {base_query}"
-    data_query = f"SELECT * {base_query} ORDER BY ts ASC, message_id ASC LIMIT ? OFFSET ?"
-    
+    count_query = f"SELECT COUNT(*) FROM messages m {where}"
+    data_query = f"""
+        SELECT {MESSAGE_COLUMNS} FROM messages m {MESSAGE_JOINS} {where}
+        ORDER BY m.ts_ms ASC, m.message_id ASC LIMIT ? OFFSET ?
+    """
+    return count_query, data_query, params
+
+def preload_recent():
+    """
+    Fill the recent-message buffer with the newest messages by timestamp.
+    """
+    capacity = recent_buffer.capacity
+    if not capacity:
+        return
     with get_db_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT m.message_id, nf.msisdn, nt.msisdn, m.ts, {MESSAGE_TEXT}, m.ts_ms
+            FROM messages m {MESSAGE_JOINS}
+            ORDER BY m.ts_ms DESC, m.message_id DESC LIMIT ?
+            """,
+            (capacity,)
+        ).fetchall()
+    recent_buffer.load([RecentMessage(*row) for row in rows], complete=len(rows) < capacity)
+
+def prime_db_cache(rows: int) -> int:
+    """
+    Read the newest `rows` entries of the indexes used by inserts and reads,
+    so their pages are in the OS page cache, and fill the number cache.
+    SQLite's own page cache is per connection and does not outlive this call.
+    Returns the number of index entries read.
+    """
+    queries = [
+        "SELECT seq FROM messages ORDER BY seq DESC LIMIT ?",
+        "SELECT ts_ms, message_id FROM messages ORDER BY ts_ms DESC, message_id DESC LIMIT ?",
+        "SELECT last_ts_ms, party_a, party_b FROM conversations ORDER BY last_ts_ms DESC, party_a DESC, party_b DESC LIMIT ?",
+    ]
+    touched = 0
+    with get_db_connection() as conn:
+        for query in queries:
+            touched += len(conn.execute(query, (rows,)).fetchall())
+
+        cache = number_cache()
+        numbers = conn.execute("SELECT msisdn, id FROM numbers LIMIT ?", (settings.NUMBER_CACHE_SIZE // 2,)).fetchall()
+        cache.update((msisdn, number_id) for msisdn, number_id in numbers)
+    return touched + len(numbers)
+
+def get_messages(limit: int, offset: int, from_msisdn: Optional[str], since: Optional[str], q: Optional[str]) -> Tuple[List[sqlite3.Row], int]:
+    since_ms = iso_to_epoch_ms(since) if since else None
+    # With a snapshot active every read comes from it, so X-Snapshot-Age-Seconds holds for the whole response.
+    cached = None if read_snapshot.current_path() else recent_buffer.query(limit, offset, from_msisdn, since_ms, q)
+    if cached is not None:
+        metrics.RECENT_BUFFER_QUERIES_TOTAL.labels(result="hit").inc()
+        return cached
+    metrics.RECENT_BUFFER_QUERIES_TOTAL.labels(result="miss").inc()
+
+    with get_read_connection() as conn:
+        from_id = None
+        if from_msisdn:
+            from_id = lookup_number_id(conn, from_msisdn)
+            if from_id is None:
+                return [], 0
+
+        count_query, data_query, params = build_messages_query(from_id, since, q)
+
         total = conn.execute(count_query, params).fetchone()[0]
         
         params.append(limit)
@@ -92,21 +365,114 @@ def get_messages(limit: int, offset: int, from_msisdn: Optional[str], since: Opt
             
         return rows, total
 
-def get_stats() -> Dict[str, Any]:
+def get_messages_after(seq: int, from_msisdn: Optional[str], limit: int) -> List[sqlite3.Row]:
+    """
+    Messages stored after ingest sequence number `seq`, in ingest order.
+    Serves the change feed and replays the gap when a stream resumes from Last-Event-ID.
+    """
     with get_db_connection() as conn:
+        query = f"SELECT m.seq, {MESSAGE_COLUMNS} FROM messages m {MESSAGE_JOINS} WHERE m.seq > ?"
+        params: List[Any] = [seq]
+        if from_msisdn:
+            from_id = lookup_number_id(conn, from_msisdn)
+            if from_id is None:
+                return []
+            query += " AND m.from_id = ?"
+            params.append(from_id)
+        query += " ORDER BY m.seq ASC LIMIT ?"
+        params.append(limit)
+
+        return conn.execute(query, params).fetchall()
+
+def get_conversations(limit: int, cursor: Optional[List[Any]]) -> Tuple[List[sqlite3.Row], Optional[List[Any]]]:
+    """
+    Conversations ordered by latest message, newest first.
+    Returns (rows, next_cursor) where the cursor is (last_ts_ms, party_a, party_b).
+    """
+    query = f"""
+        SELECT c.party_a, c.party_b, c.message_count, c.last_ts_ms,
+               m.message_id, nf.msisdn AS from_msisdn, nt.msisdn AS to_msisdn, m.ts, {MESSAGE_TEXT} AS text
+        FROM conversations c
+        JOIN messages m ON m.message_id = c.last_message_id
+        JOIN numbers nf ON nf.id = m.from_id
+        JOIN numbers nt ON nt.id = m.to_id
+    """
+    params: List[Any] = []
+    if cursor:
+        query += " WHERE (c.last_ts_ms, c.party_a, c.party_b) < (?, ?, ?)"
+        params.extend(cursor)
+    query += " ORDER BY c.last_ts_ms DESC, c.party_a DESC, c.party_b DESC LIMIT ?"
+    params.append(limit)
+
+    with get_db_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = [last["last_ts_ms"], last["party_a"], last["party_b"]]
+    return rows, next_cursor
+
+def get_conversation_messages(msisdn_1: str, msisdn_2: str, limit: int, cursor: Optional[List[Any]]) -> Tuple[List[sqlite3.Row], Optional[List[Any]]]:
+    """
+    Messages exchanged between two numbers in either direction, oldest first.
+    Returns (rows, next_cursor) where the cursor is (ts_ms, message_id).
+    """
+    with get_db_connection() as conn:
+        id_1 = lookup_number_id(conn, msisdn_1)
+        id_2 = lookup_number_id(conn, msisdn_2)
+        if id_1 is None or id_2 is None:
+            return [], None
+
+        directions = [(id_1, id_2)]
+        if id_1 != id_2:
+            directions.append((id_2, id_1))
+
+        # Each direction is a range scan on idx_messages_from_to_ts; only the merged page is sorted.
+        branch = f"SELECT {MESSAGE_COLUMNS} FROM messages m {MESSAGE_JOINS} WHERE m.from_id = ? AND m.to_id = ?"
+        if cursor:
+            branch += " AND (m.ts_ms, m.message_id) > (?, ?)"
+        branch += " ORDER BY m.ts_ms ASC, m.message_id ASC LIMIT ?"
+        query = " UNION ALL ".join(f"SELECT * FROM ({branch})" for _ in directions)
+        query += " ORDER BY ts_ms ASC, message_id ASC LIMIT ?"
+
+        params: List[Any] = []
+        for sender, recipient in directions:
+            params.extend([sender, recipient])
+            if cursor:
+                params.extend(cursor)
+            params.append(limit)
+        params.append(limit)
+
+        rows = conn.execute(query, params).fetchall()
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = [last["ts_ms"], last["message_id"]]
+    return rows, next_cursor
+
+def get_stats() -> Dict[str, Any]:
+    with get_read_connection() as conn:
         total_messages = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
         
-        ts_stats = conn.execute("SELECT MIN(ts), MAX(ts) FROM messages").fetchone()
+        first_ts = conn.execute("SELECT ts FROM messages ORDER BY ts_ms ASC, message_id ASC LIMIT 1").fetchone()
+        last_ts = conn.execute("SELECT ts FROM messages ORDER BY ts_ms DESC, message_id DESC LIMIT 1").fetchone()
         
         senders_rows = conn.execute("""
-            SELECT from_msisdn, COUNT(*) as count 
-            FROM messages 
-            GROUP BY from_msisdn 
-            ORDER BY count DESC 
-            LIMIT 10
+            SELECT n.msisdn AS from_msisdn, s.count
+            FROM (
+                SELECT from_id, COUNT(*) as count 
+                FROM messages 
+                GROUP BY from_id 
+                ORDER BY count DESC 
+                LIMIT 10
+            ) s
+            JOIN numbers n ON n.id = s.from_id
+            ORDER BY s.count DESC
         """).fetchall()
         
-        unique_senders = conn.execute("SELECT COUNT(DISTINCT from_msisdn) FROM messages").fetchone()[0]
+        unique_senders = conn.execute("SELECT COUNT(DISTINCT from_id) FROM messages").fetchone()[0]
         
         messages_per_sender = [
             {"from": row["from_msisdn"], "count": row["count"]} for row in senders_rows
@@ -116,14 +482,6 @@ def get_stats() -> Dict[str, Any]:
             "total_messages": total_messages,
             "senders_count": unique_senders,
             "messages_per_sender": messages_per_sender,
-            "first_message_ts": ts_stats[0],
-            "last_message_ts": ts_stats[1]
+            "first_message_ts": first_ts[0] if first_ts else None,
+            "last_message_ts": last_ts[0] if last_ts else None
         }
-
-def check_db_ready() -> bool:
-    try:
-        with get_db_connection() as conn:
-            conn.execute("SELECT 1")
-        return True
-    except:
-        return False
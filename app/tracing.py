@@ -0,0 +1,175 @@
+import sqlite3
+import timeit
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+from app.config import settings
+from app.logging_utils import logger
+from app import metrics
+
+
+class QueryRecord:
+    """
+    One statement: normalized SQL, time spent in execute and fetches, and rows returned or changed.
+    """
+    __slots__ = ("sql", "params", "duration_ms", "rows")
+
+    def __init__(self, sql: str, params: Any):
+        self.sql = " ".join(sql.split())
+        self.params = params
+        self.duration_ms = 0.0
+        self.rows = 0
+
+
+class QueryTrace:
+    """
+    Statements executed on behalf of one request, in order.
+    """
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id
+        self.queries: List[QueryRecord] = []
+
+    @property
+    def total_ms(self) -> float:
+        return sum(query.duration_ms for query in self.queries)
+
+    def server_timing(self, total_ms: float) -> str:
+        """
+        `Server-Timing` value: DB total, each statement in order, and the rest of the request as `app`.
+        """
+        db_ms = self.total_ms
+        entries = [f'db;dur={db_ms:.2f};desc="{len(self.queries)} queries"']
+        for i, query in enumerate(self.queries[:settings.SERVER_TIMING_MAX_QUERIES], start=1):
+            entries.append(f'sql-{i};dur={query.duration_ms:.2f};desc="{query.rows} rows"')
+        entries.append(f"app;dur={max(total_ms - db_ms, 0):.2f}")
+        return ", ".join(entries)
+
+    def summary(self) -> List[dict]:
+        return [
+            {"sql": query.sql, "duration_ms": round(query.duration_ms, 2), "rows": query.rows}
+            for query in self.queries
+        ]
+
+
+current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("current_trace", default=None)
+
+
+class TracingCursor(sqlite3.Cursor):
+    """
+    Cursor that charges execute and fetch time to the statement's `QueryRecord`.
+    """
+    record: Optional[QueryRecord] = None
+
+    def fetchone(self):
+        start = timeit.default_timer()
+        row = super().fetchone()
+        self._charge(start, 1 if row is not None else 0, done=row is None)
+        return row
+
+    def fetchmany(self, size: int = 1):
+        start = timeit.default_timer()
+        rows = super().fetchmany(size)
+        self._charge(start, len(rows), done=len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = timeit.default_timer()
+        rows = super().fetchall()
+        self._charge(start, len(rows), done=True)
+        return rows
+
+    def __next__(self):
+        start = timeit.default_timer()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._charge(start, 0, done=True)
+            raise
+        self._charge(start, 1, done=False)
+        return row
+
+    def _charge(self, start: float, rows: int, done: bool):
+        if self.record is not None:
+            self.record.duration_ms += (timeit.default_timer() - start) * 1000
+            self.record.rows += rows
+            if done and self.connection.pending is self.record:
+                self.connection.settle()
+
+
+class TracingConnection(sqlite3.Connection):
+    """
+    `sqlite3.connect(factory=TracingConnection)`: every `execute`/`executemany`
+    is recorded on the current request's `QueryTrace` (if any). Statements over
+    `SLOW_QUERY_MS` are logged with their query plan as soon as they finish:
+    after execute, when the last row is fetched, or at the latest when the next
+    statement starts. Only that one unfinished statement is kept, so long-lived
+    connections (backfills, re-compression) don't accumulate records.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending: Optional[QueryRecord] = None
+
+    def execute(self, sql: str, parameters: Any = ()):
+        return self._run(sql, parameters, many=False)
+
+    def executemany(self, sql: str, parameters: Any):
+        return self._run(sql, parameters, many=True)
+
+    def _run(self, sql: str, parameters: Any, many: bool) -> TracingCursor:
+        self.settle()
+        cursor = self.cursor(TracingCursor)
+        record = cursor.record = self.pending = QueryRecord(sql, None if many else parameters)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.queries.append(record)
+
+        start = timeit.default_timer()
+        try:
+            if many:
+                cursor.executemany(sql, parameters)
+            else:
+                cursor.execute(sql, parameters)
+        finally:
+            record.duration_ms += (timeit.default_timer() - start) * 1000
+            if cursor.rowcount > 0:
+                record.rows = cursor.rowcount
+        if cursor.description is None:
+            # No rows to fetch: the statement is done.
+            self.settle()
+        return cursor
+
+    def settle(self):
+        """
+        The pending statement is done: log it if it was slow.
+        """
+        record, self.pending = self.pending, None
+        threshold = settings.SLOW_QUERY_MS
+        if record is not None and threshold and record.duration_ms >= threshold:
+            self.log_slow_query(record)
+
+    def close(self):
+        self.settle()
+        super().close()
+
+    def log_slow_query(self, record: QueryRecord):
+        metrics.DB_SLOW_QUERIES_TOTAL.inc()
+        trace = current_trace.get()
+        plan = None
+        if record.params is not None:
+            try:
+                plan = [
+                    row[3] for row in
+                    sqlite3.Connection.execute(self, f"EXPLAIN QUERY PLAN {record.sql}", record.params)
+                ]
+            except sqlite3.Error:
+                pass
+
+        log_data = {
+            "event": "slow_query",
+            "request_id": trace.request_id if trace is not None else None,
+            "sql": record.sql,
+            "duration_ms": round(record.duration_ms, 2),
+            "rows": record.rows,
+            "plan": plan,
+        }
+        logger.warning(log_data, extra=log_data)
@@ -0,0 +1,143 @@
+import json
+import sys
+import threading
+import timeit
+from typing import Callable, List, Optional, Tuple
+
+import phonenumbers
+from phonenumbers import PhoneMetadata
+from pydantic import ValidationError
+
+from app.config import settings
+from app.logging_utils import logger
+from app.models import WebhookPayload, MessageResponse, ChangeResponse, iso_to_epoch_ms
+from app.signing import get_registry
+from app import metrics
+from app import storage
+
+
+def parse_country_codes(value: str) -> List[int]:
+    return [int(code) for code in value.replace(" ", "").split(",") if code]
+
+
+def preload_phone_metadata(country_codes: List[int]):
+    """
+    Import the phonenumbers metadata module of every region sharing each calling
+    code. `is_valid_number` may consult any of them, and each is otherwise
+    imported on the first request that needs it.
+    """
+    for code in country_codes:
+        for region in phonenumbers.COUNTRY_CODE_TO_REGION_CODE.get(code, ()):
+            non_geo = region == phonenumbers.REGION_CODE_FOR_NON_GEO_ENTITY
+            module = f"phonenumbers.data.region_{code if non_geo else region}"
+            if module in sys.modules:
+                continue
+            start_time = timeit.default_timer()
+            if non_geo:
+                PhoneMetadata.metadata_for_nongeo_region(code)
+            else:
+                PhoneMetadata.metadata_for_region(region)
+            metrics.STARTUP_IMPORT_SECONDS.labels(module=module).set(timeit.default_timer() - start_time)
+
+
+def example_numbers(country_codes: List[int]) -> List[str]:
+    """
+    An E.164 example number for every region of each calling code.
+    """
+    numbers = []
+    for code in country_codes:
+        for region in phonenumbers.COUNTRY_CODE_TO_REGION_CODE.get(code, ()):
+            if region == phonenumbers.REGION_CODE_FOR_NON_GEO_ENTITY:
+                example = phonenumbers.example_number_for_non_geo_entity(code)
+            else:
+                example = phonenumbers.example_number(region)
+            if example is not None:
+                numbers.append(phonenumbers.format_number(example, phonenumbers.PhoneNumberFormat.E164))
+    return numbers
+
+
+def exercise_validators(country_codes: List[int]):
+    """
+    Run the webhook payload validators, accepting and rejecting. Validating one
+    number per region compiles the number patterns `is_valid_number` uses.
+    """
+    numbers = example_numbers(country_codes)
+    for number in numbers + ["+0"]:
+        try:
+            payload = WebhookPayload.model_validate({
+                "message_id": "warmup", "from": number, "to": number, "ts": "1970-01-01T00:00:00Z", "text": "warmup"
+            })
+            iso_to_epoch_ms(payload.ts)
+        except ValidationError:
+            pass
+
+
+def exercise_serializers():
+    """
+    Serialize a message through the response models and JSON, and run each signing key once.
+    """
+    row = {
+        "message_id": "warmup", "from_msisdn": "+14155550100", "to_msisdn": "+14155550100",
+        "ts": "1970-01-01T00:00:00Z", "text": "warmup", "seq": 0
+    }
+    json.dumps([
+        MessageResponse.model_validate(row).model_dump(by_alias=True),
+        ChangeResponse.model_validate(row).model_dump(by_alias=True),
+    ])
+    for key in get_registry().keys:
+        key.matches(b"{}", "")
+
+
+class Warmup:
+    """
+    Pays first-use costs in a background thread after startup: phonenumbers
+    metadata, validators and serializers, and the hot end of the DB indexes.
+    `/health/ready` reports not-ready while it runs. Each step is timed in
+    `warmup_step_seconds`; a failing step is logged and skipped.
+    """
+    def __init__(self, enabled: bool, country_codes: List[int], db_rows: int):
+        self.enabled = enabled
+        self.country_codes = country_codes
+        self.db_rows = db_rows
+
+        self.running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def steps(self) -> List[Tuple[str, Callable[[], None]]]:
+        return [
+            ("phonenumbers", lambda: preload_phone_metadata(self.country_codes)),
+            ("validators", lambda: exercise_validators(self.country_codes)),
+            ("serializers", exercise_serializers),
+            ("db_cache", lambda: storage.prime_db_cache(self.db_rows)),
+        ]
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        start_time = timeit.default_timer()
+        try:
+            for name, step in self.steps():
+                step_start = timeit.default_timer()
+                try:
+                    step()
+                except Exception as e:
+                    logger.warning({"event": "warmup", "step": name, "status": "failed", "error": str(e)})
+                metrics.WARMUP_STEP_SECONDS.labels(step=name).set(timeit.default_timer() - step_start)
+        finally:
+            self.running = False
+        logger.info({"event": "warmup", "status": "complete", "duration_ms": round((timeit.default_timer() - start_time) * 1000, 2)})
+
+    def ready(self) -> bool:
+        return not self.running
+
+
+warmup = Warmup(
+    enabled=settings.WARMUP_ENABLED,
+    country_codes=parse_country_codes(settings.WARMUP_COUNTRY_CODES),
+    db_rows=settings.WARMUP_DB_ROWS,
+)
@@ -0,0 +1,115 @@
+"""
+Per-request overhead of request instrumentation on /webhook and /health/live.
+
+Runs the app's routes in-process over ASGI with three middleware stacks:
+none, the previous `@app.middleware("http")` (BaseHTTPMiddleware) version
+and the pure ASGI `RequestInstrumentationMiddleware`. Access logs are
+silenced for all stacks so the numbers reflect middleware machinery only.
+
+    python -m benchmarks.bench_middleware
+"""
+import asyncio
+import hmac
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import timeit
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("WEBHOOK_SECRET", "testsecret")
+os.environ.setdefault("SENDER_RATE_PER_SEC", "0")
+
+import httpx
+from fastapi import FastAPI, Request
+
+from app.main import app as instrumented_app
+from app.middleware import RequestInstrumentationMiddleware
+from app.logging_utils import logger
+from app import metrics
+from app import storage
+
+REQUESTS = 2000
+BODY = json.dumps({
+    "message_id": "bench_1",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": "Hello World",
+}).encode()
+HEADERS = {
+    "X-Signature": hmac.new(os.environ["WEBHOOK_SECRET"].encode(), BODY, hashlib.sha256).hexdigest(),
+    "Content-Type": "application/json",
+}
+
+
+async def legacy_log_requests(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID", str(time.time()))
+    start_time = timeit.default_timer()
+
+    response = await call_next(request)
+
+    latency_ms = (timeit.default_timer() - start_time) * 1000
+
+    metrics.HTTP_REQUESTS_TOTAL.labels(path=request.url.path, status=response.status_code).inc()
+    metrics.REQUEST_LATENCY_MS.observe(latency_ms)
+
+    log_data = {
+        "request_id": request_id,
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        "latency_ms": round(latency_ms, 2)
+    }
+    logger.info(log_data, extra=log_data)
+
+    return response
+
+
+def build_app(middleware: str) -> FastAPI:
+    bench_app = FastAPI()
+    bench_app.router.routes.extend(instrumented_app.router.routes)
+    bench_app.exception_handlers.update(instrumented_app.exception_handlers)
+    if middleware == "base_http":
+        bench_app.middleware("http")(legacy_log_requests)
+    elif middleware == "asgi":
+        bench_app.add_middleware(RequestInstrumentationMiddleware)
+    return bench_app
+
+
+async def measure(bench_app: FastAPI, method: str, path: str, **kwargs) -> float:
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.request(method, path, **kwargs)
+        start = timeit.default_timer()
+        for _ in range(REQUESTS):
+            response = await client.request(method, path, **kwargs)
+        elapsed = timeit.default_timer() - start
+    assert response.status_code == 200, response.text
+    return elapsed / REQUESTS * 1e6
+
+
+async def main():
+    storage.init_db()
+    logger.setLevel(logging.WARNING)
+
+    endpoints = {
+        "/health/live": ("GET", "/health/live", {}),
+        "/webhook": ("POST", "/webhook", {"content": BODY, "headers": HEADERS}),
+    }
+    for name, (method, path, kwargs) in endpoints.items():
+        results = {}
+        for middleware in ("none", "base_http", "asgi"):
+            results[middleware] = await measure(build_app(middleware), method, path, **kwargs)
+        print(
+            f"{name:14s} none {results['none']:7.1f} us  "
+            f"base_http {results['base_http']:7.1f} us (+{results['base_http'] - results['none']:.1f})  "
+            f"asgi {results['asgi']:7.1f} us (+{results['asgi'] - results['none']:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
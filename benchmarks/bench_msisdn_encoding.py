@@ -0,0 +1,105 @@
+"""
+Database size and /stats query latency before and after dictionary-encoding MSISDNs.
+
+Builds a schema-version-4 database (text from_msisdn/to_msisdn), measures the
+file size and the previous `get_stats` queries, then applies migration 5
+(timing it and the WAL it leaves behind, i.e. the write lock held and the
+extra disk it needs), VACUUMs and measures the new file size and `storage.get_stats`.
+
+    python -m benchmarks.bench_msisdn_encoding
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import timeit
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import migrations
+from app import storage
+
+MESSAGES = 200_000
+SENDERS = 5_000
+RECIPIENTS = 50
+RUNS = 10
+
+
+def legacy_stats(conn: sqlite3.Connection):
+    conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+    conn.execute("""
+        SELECT from_msisdn, COUNT(*) as count
+        FROM messages
+        GROUP BY from_msisdn
+        ORDER BY count DESC
+        LIMIT 10
+    """).fetchall()
+    conn.execute("SELECT COUNT(DISTINCT from_msisdn) FROM messages").fetchone()
+    conn.execute("SELECT ts FROM messages ORDER BY ts_ms ASC, message_id ASC LIMIT 1").fetchone()
+    conn.execute("SELECT ts FROM messages ORDER BY ts_ms DESC, message_id DESC LIMIT 1").fetchone()
+
+
+def build_v4(path: str):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for version, _name, migration in migrations.MIGRATIONS[:4]:
+        conn.execute("BEGIN")
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+
+    rng = random.Random(0)
+    senders = [f"+9198{rng.randrange(10**8):08d}" for _ in range(SENDERS)]
+    recipients = [f"+1415555{i:04d}" for i in range(RECIPIENTS)]
+    base_ms = 1_735_689_600_000
+    rows = []
+    for i in range(MESSAGES):
+        ts_ms = base_ms + i * 1000
+        ts = f"2025-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z"
+        rows.append((f"bench_{i}", rng.choice(senders), rng.choice(recipients), ts, "Hello World", ts, ts_ms, ts_ms))
+    conn.executemany(
+        """
+        INSERT INTO messages (message_id, from_msisdn, to_msisdn, ts, text, created_at, ts_ms, created_at_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def timed(fn) -> float:
+    fn()
+    return min(timeit.repeat(fn, number=1, repeat=RUNS)) * 1000
+
+
+def main():
+    path = storage.db_path
+    build_v4(path)
+
+    with storage.get_db_connection() as conn:
+        before_size = os.path.getsize(path)
+        before_ms = timed(lambda: legacy_stats(conn))
+
+        start = timeit.default_timer()
+        conn.execute("BEGIN")
+        migrations.dictionary_encoded_numbers(conn)
+        conn.execute("PRAGMA user_version = 5")
+        conn.commit()
+        migration_s = timeit.default_timer() - start
+        wal_size = os.path.getsize(path + "-wal")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    after_size = os.path.getsize(path)
+    after_ms = timed(storage.get_stats)
+
+    print(f"{MESSAGES} messages, {SENDERS} senders, {RECIPIENTS} recipients")
+    print(f"db size   text {before_size / 1e6:7.2f} MB  encoded {after_size / 1e6:7.2f} MB  ({after_size / before_size - 1:+.0%})")
+    print(f"/stats    text {before_ms:7.2f} ms  encoded {after_ms:7.2f} ms  ({after_ms / before_ms - 1:+.0%})")
+    print(f"migration {migration_s:7.2f} s write lock, WAL {wal_size / 1e6:7.2f} MB ({wal_size / before_size:.1f}x the v4 file)")
+
+
+if __name__ == "__main__":
+    main()
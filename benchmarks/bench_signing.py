@@ -0,0 +1,61 @@
+"""
+Per-request webhook signature verification cost.
+
+Compares building a fresh HMAC per request (previous `verify_signature`),
+copying precomputed keyed state on its own, and the full `KeyRegistry.verify`
+(state copy plus per-key outcome counter).
+
+    python -m benchmarks.bench_signing
+"""
+import hmac
+import hashlib
+import json
+import timeit
+
+from app.signing import KeyRegistry
+
+SECRET = "testsecret"
+BODY = json.dumps({
+    "message_id": "bench_1",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": "Hello World " * 20,
+}).encode()
+SIGNATURE = hmac.new(SECRET.encode(), BODY, hashlib.sha256).hexdigest()
+NUMBER = 200_000
+
+
+def fresh_hmac():
+    computed = hmac.new(key=SECRET.encode(), msg=BODY, digestmod=hashlib.sha256).hexdigest()
+    return hmac.compare_digest(computed, SIGNATURE)
+
+
+PRECOMPUTED = hmac.new(SECRET.encode(), digestmod=hashlib.sha256)
+
+
+def precomputed_copy():
+    mac = PRECOMPUTED.copy()
+    mac.update(BODY)
+    return hmac.compare_digest(mac.hexdigest(), SIGNATURE)
+
+
+def main():
+    single = KeyRegistry.from_config(SECRET, "")
+    rotated = KeyRegistry.from_config("next-secret", f"old:{SECRET}")
+
+    cases = {
+        "fresh hmac.new per request": fresh_hmac,
+        "precomputed state .copy()": precomputed_copy,
+        "registry, single key": lambda: single.verify(BODY, SIGNATURE)[0],
+        "registry, key id header": lambda: rotated.verify(BODY, SIGNATURE, "old")[0],
+        "registry, second of two keys": lambda: rotated.verify(BODY, SIGNATURE)[0],
+    }
+    for name, fn in cases.items():
+        assert fn()
+        seconds = min(timeit.repeat(fn, number=NUMBER, repeat=7))
+        print(f"{name:34s} {seconds / NUMBER * 1e6:8.3f} us/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Size savings and read/write CPU cost of compressing message text with a trained zlib dictionary.
+
+Stores the same templated messages into two databases, one plain and one
+compressed (dictionary trained from the first messages, then the
+re-compression pass), VACUUMs both and compares file size, `store_message`
+time, codec CPU per message and `get_messages` page latency.
+
+    python -m benchmarks.bench_text_compression
+"""
+import os
+import random
+import tempfile
+import timeit
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app.config import settings
+from app.logging_utils import logger
+from app.models import WebhookPayload
+from app.recent import RecentBuffer
+from app.recompress import TextRecompressor
+from app import storage
+
+MESSAGES = 50_000
+TRAIN_AFTER = 2_000
+PAGE = 100
+RUNS = 20
+
+TEMPLATES = [
+    "Your verification code is {code}. It expires in 10 minutes. Do not share this code with anyone, including our staff.",
+    "Hi {name}, your order #{order} has been shipped and will arrive by {day}. Track it at https://example.com/t/{order}",
+    "Payment of INR {amount}.00 received for invoice {order}. Thank you for your business, {name}!",
+    "Reminder: your appointment with Dr. {name} is on {day} at 10:30 AM. Reply C to confirm or R to reschedule.",
+    "{name}, your account balance is INR {amount}.00 as of {day}. Call 1800-123-456 for any queries.",
+    "Your OTP for login is {code}. If you did not request this, please contact support immediately.",
+]
+NAMES = ["Asha", "Ravi", "Meera", "John", "Fatima", "Wei", "Carlos", "Priya"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def make_payloads(count: int):
+    rng = random.Random(0)
+    payloads = []
+    for i in range(count):
+        text = rng.choice(TEMPLATES).format(
+            code=rng.randrange(10**6), name=rng.choice(NAMES), order=rng.randrange(10**8),
+            day=rng.choice(DAYS), amount=rng.randrange(10**5)
+        )
+        payloads.append(WebhookPayload.model_validate({
+            "message_id": f"bench_{i}",
+            "from": f"+9198{rng.randrange(1000):08d}",
+            "to": "+14155550100",
+            "ts": f"2025-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "text": text,
+        }))
+    return payloads
+
+
+def fill(path: str, payloads, compressed: bool) -> float:
+    """
+    Store `payloads` into a fresh DB at `path`. Returns mean store_message time in microseconds.
+    """
+    storage.db_path = path
+    settings.TEXT_COMPRESSION_ENABLED = compressed
+    storage.init_db()
+    job = TextRecompressor(
+        enabled=True, retrain_s=0, sample_size=settings.TEXT_DICT_SAMPLE_SIZE, min_samples=1,
+        dict_size=settings.TEXT_DICT_SIZE, batch_size=settings.TEXT_RECOMPRESS_BATCH, batch_sleep_s=0
+    )
+
+    elapsed = 0.0
+    for i, payload in enumerate(payloads):
+        if compressed and i == TRAIN_AFTER:
+            job.train()
+            job.recompress()
+        start = timeit.default_timer()
+        storage.store_message(payload)
+        elapsed += timeit.default_timer() - start
+
+    with storage.get_db_connection() as conn:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return elapsed / len(payloads) * 1e6
+
+
+def page_latency_us(path: str, q=None) -> float:
+    storage.db_path = path
+    fn = lambda: storage.get_messages(PAGE, 0, None, None, q)
+    fn()
+    return min(timeit.repeat(fn, number=1, repeat=RUNS)) * 1e6
+
+
+def main():
+    logger.setLevel("WARNING")
+    storage.recent_buffer = RecentBuffer(capacity=0)
+    payloads = make_payloads(MESSAGES)
+    workdir = tempfile.mkdtemp()
+    plain_path = os.path.join(workdir, "plain.db")
+    compressed_path = os.path.join(workdir, "compressed.db")
+
+    plain_write = fill(plain_path, payloads, compressed=False)
+    compressed_write = fill(compressed_path, payloads, compressed=True)
+
+    plain_size = os.path.getsize(plain_path)
+    compressed_size = os.path.getsize(compressed_path)
+    text_bytes = sum(len(p.text.encode()) for p in payloads)
+
+    print(f"{MESSAGES} messages, {text_bytes / MESSAGES:.0f} text bytes/message")
+    print(f"db size         plain {plain_size / 1e6:8.2f} MB  compressed {compressed_size / 1e6:8.2f} MB  ({compressed_size / plain_size - 1:+.0%})")
+    print(f"store_message   plain {plain_write:8.1f} us  compressed {compressed_write:8.1f} us  (+{compressed_write - plain_write:.1f} us)")
+    codec = storage.text_codec()
+    version = codec.active[0]
+    texts = [p.text for p in payloads[:2000]]
+    blobs = [codec.encode_with(text, version)[1] for text in texts]
+    encode_us = min(timeit.repeat(lambda: [codec.encode_with(t, version) for t in texts], number=1, repeat=5)) / len(texts) * 1e6
+    decode_us = min(timeit.repeat(lambda: [codec.decode(b, version) for b in blobs], number=1, repeat=5)) / len(blobs) * 1e6
+    print(f"dictionary      {len(codec.active[1])} bytes, {sum(map(len, blobs)) / len(blobs):.0f} compressed bytes/message")
+    print(f"codec CPU       encode {encode_us:6.1f} us/message  decode {decode_us:6.1f} us/message")
+    for label, q in (("page", None), ("page q=", "order")):
+        plain = page_latency_us(plain_path, q)
+        compressed = page_latency_us(compressed_path, q)
+        print(f"{label:15s} plain {plain:8.1f} us  compressed {compressed:8.1f} us  (+{compressed - plain:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import pytest
+from app import storage
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """
+    Point storage at a database file of its own under `tmp_path`, so the test
+    neither sees nor leaves rows in the shared DB. No schema is created.
+    """
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(storage, "db_path", path)
+    return path
+
+@pytest.fixture
+def fresh_db(db_path):
+    """
+    An empty database at the latest schema version.
+    """
+    storage.init_db()
+    return db_path
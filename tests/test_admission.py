@@ -0,0 +1,71 @@
+import pytest
+import hmac
+import hashlib
+import json
+from fastapi.testclient import TestClient
+from app import main
+from app.main import app
+from app.admission import AdmissionController
+from app.config import settings
+
+client = TestClient(app)
+SECRET = settings.WEBHOOK_SECRET or "testsecret"
+settings.WEBHOOK_SECRET = SECRET
+
+def generate_signature(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def post_message(message_id: str):
+    payload = {
+        "message_id": message_id,
+        "from": "+919876543210",
+        "to": "+14155550100",
+        "ts": "2025-02-01T10:00:00Z",
+        "text": "Burst"
+    }
+    body = json.dumps(payload).encode()
+    sig = generate_signature(body, SECRET)
+    return client.post("/webhook", content=body, headers={"X-Signature": sig, "Content-Type": "application/json"})
+
+def test_in_flight_limit():
+    controller = AdmissionController(max_in_flight=1, shed_latency_ms=0, sender_rate=0, sender_burst=0)
+    assert controller.try_enter() is None
+    assert controller.try_enter() == "shed_in_flight"
+    controller.leave()
+    assert controller.try_enter() is None
+
+def test_latency_shedding():
+    controller = AdmissionController(max_in_flight=0, shed_latency_ms=100, sender_rate=0, sender_burst=0)
+    controller.observe_db_latency(500)
+    assert controller.try_enter() == "shed_latency"
+
+    controller.latency_stale_s = 0
+    assert controller.try_enter() is None
+
+def test_sender_token_bucket():
+    controller = AdmissionController(max_in_flight=0, shed_latency_ms=0, sender_rate=1, sender_burst=2)
+    assert controller.allow_sender("+1") == (True, 0)
+    assert controller.allow_sender("+1") == (True, 0)
+    allowed, retry_after = controller.allow_sender("+1")
+    assert not allowed
+    assert retry_after >= 1
+    assert controller.allow_sender("+2") == (True, 0)
+
+def test_webhook_rate_limited(monkeypatch):
+    controller = AdmissionController(max_in_flight=0, shed_latency_ms=0, sender_rate=0.001, sender_burst=1)
+    monkeypatch.setattr(main, "admission", controller)
+
+    assert post_message("adm_1").status_code == 200
+
+    response = post_message("adm_2")
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+def test_webhook_shed_on_latency(monkeypatch):
+    controller = AdmissionController(max_in_flight=0, shed_latency_ms=1, sender_rate=0, sender_burst=0)
+    controller.observe_db_latency(1000)
+    monkeypatch.setattr(main, "admission", controller)
+
+    response = post_message("adm_3")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,66 @@
+import hmac
+import hashlib
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.tracing import QueryTrace, current_trace
+from app import storage
+
+client = TestClient(app)
+SECRET = settings.WEBHOOK_SECRET or "testsecret"
+settings.WEBHOOK_SECRET = SECRET
+
+def generate_signature(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def post_message(message_id: str, ts: str):
+    body = json.dumps({
+        "message_id": message_id,
+        "from": "+14155550161",
+        "to": "+14155550100",
+        "ts": ts,
+        "text": "Change",
+    }).encode()
+    headers = {"X-Signature": generate_signature(body, SECRET), "Content-Type": "application/json"}
+    assert client.post("/webhook", content=body, headers=headers).status_code == 200
+
+def test_changes_in_ingest_order(fresh_db):
+    # Arrives out of timestamp order; the feed follows arrival.
+    post_message("change_late", "2025-09-01T12:00:00Z")
+    post_message("change_early", "2025-09-01T08:00:00Z")
+    post_message("change_late", "2025-09-01T12:00:00Z")
+    post_message("change_last", "2025-09-01T10:00:00Z")
+
+    response = client.get("/messages/changes", params={"after_seq": 0, "limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert [(m["seq"], m["message_id"]) for m in page["data"]] == [(1, "change_late"), (2, "change_early")]
+    assert page["data"][0]["from"] == "+14155550161"
+    assert page["next_seq"] == 2
+
+    page = client.get("/messages/changes", params={"after_seq": 2, "limit": 2}).json()
+    assert [(m["seq"], m["message_id"]) for m in page["data"]] == [(3, "change_last")]
+    assert page["next_seq"] == 3
+
+    empty = client.get("/messages/changes", params={"after_seq": 3}).json()
+    assert empty["data"] == []
+    assert empty["next_seq"] == 3
+
+def test_changes_query_is_index_range_scan():
+    trace = QueryTrace()
+    token = current_trace.set(trace)
+    try:
+        storage.get_messages_after(0, None, 100)
+    finally:
+        current_trace.reset(token)
+
+    query = trace.queries[-1]
+    with storage.get_db_connection() as conn:
+        plan = [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", query.params)]
+    assert any("USING INDEX idx_messages_seq (seq>?)" in detail for detail in plan), plan
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+def test_changes_invalid_params():
+    assert client.get("/messages/changes", params={"after_seq": -1}).status_code == 422
+    assert client.get("/messages/changes", params={"limit": 0}).status_code == 422
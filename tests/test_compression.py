@@ -0,0 +1,95 @@
+import pytest
+from app.compression import compress, decompress, train_dictionary
+from app.config import settings
+from app.models import WebhookPayload
+from app.recent import RecentBuffer
+from app.recompress import TextRecompressor
+from app import storage
+
+TEMPLATE = "Your verification code is {code}. It expires in 10 minutes. Do not share this code with anyone."
+RECEIPT = "Payment of INR {code}.00 received for order #{code}. Thank you for shopping with us!"
+
+def make_payload(i: int, template: str = TEMPLATE) -> WebhookPayload:
+    return WebhookPayload.model_validate({
+        "message_id": f"compressed_{template[:4]}_{i}",
+        "from": "+14155550191",
+        "to": "+14155550100",
+        "ts": f"2025-10-01T10:{i // 60 % 60:02d}:{i % 60:02d}Z",
+        "text": template.format(code=100000 + i * 7919),
+    })
+
+@pytest.fixture
+def compressed_db(db_path, monkeypatch):
+    monkeypatch.setattr(storage, "recent_buffer", RecentBuffer(capacity=0))
+    monkeypatch.setattr(settings, "TEXT_COMPRESSION_ENABLED", True)
+    storage.init_db()
+
+def make_job(**overrides):
+    options = dict(
+        enabled=True, retrain_s=0, sample_size=1000, min_samples=10,
+        dict_size=4096, batch_size=7, batch_sleep_s=0
+    )
+    options.update(overrides)
+    return TextRecompressor(**options)
+
+def stored_rows():
+    with storage.get_db_connection() as conn:
+        return conn.execute("SELECT message_id, text, text_z, text_dict FROM messages ORDER BY seq").fetchall()
+
+def test_dictionary_round_trip():
+    samples = [TEMPLATE.format(code=i) for i in range(50)]
+    dictionary = train_dictionary(samples, 4096)
+    # Near-identical samples are only added once.
+    assert len(dictionary) < 2 * len(samples[0])
+
+    text = TEMPLATE.format(code=424242)
+    data = compress(text, dictionary)
+    assert decompress(data, dictionary) == text
+    assert len(data) < len(compress(text, b"")) / 3
+
+def test_train_and_recompress(compressed_db):
+    for i in range(20):
+        storage.store_message(make_payload(i))
+    # No dictionary yet: stored as plain text.
+    assert all(row["text_z"] is None for row in stored_rows())
+
+    job = make_job()
+    assert job.train() == 1
+    assert job.recompress() == 20
+    assert all(row["text"] is None and row["text_dict"] == 1 for row in stored_rows())
+
+    # New rows are compressed on insert.
+    storage.store_message(make_payload(20))
+    assert stored_rows()[-1]["text_dict"] == 1
+
+    rows, total = storage.get_messages(50, 0, "+14155550191", None, "code is 100000")
+    assert total == 1
+    assert rows[0]["text"] == TEMPLATE.format(code=100000)
+    changes = storage.get_messages_after(0, None, 100)
+    assert [row["text"] for row in changes] == [make_payload(i).text for i in range(21)]
+
+def test_retrain_rewrites_rows(compressed_db):
+    for i in range(15):
+        storage.store_message(make_payload(i))
+    job = make_job()
+    job.train()
+    job.recompress()
+
+    for i in range(40):
+        storage.store_message(make_payload(i, RECEIPT))
+    assert job.train() == 2
+    # Every row from before the new dictionary is rewritten, old and new template alike.
+    assert job.recompress() == 55
+    assert {row["text_dict"] for row in stored_rows()} == {2}
+
+    # Retraining on the same data keeps the current dictionary.
+    assert job.train() is None
+    rows, total = storage.get_messages(100, 0, None, None, None)
+    assert total == 55
+    expected = {make_payload(i).text for i in range(15)} | {make_payload(i, RECEIPT).text for i in range(40)}
+    assert {row["text"] for row in rows} == expected
+
+def test_too_few_samples(compressed_db):
+    storage.store_message(make_payload(0))
+    assert make_job().train() is None
+    assert stored_rows()[0]["text"] == make_payload(0).text
@@ -0,0 +1,106 @@
+import hmac
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+from collections import Counter
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.models import WebhookPayload
+from app.recent import RecentBuffer
+from app import storage
+
+client = TestClient(app)
+SECRET = settings.WEBHOOK_SECRET or "testsecret"
+settings.WEBHOOK_SECRET = SECRET
+
+WRITERS = 16
+MESSAGES = 60
+
+def generate_signature(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def make_payload(i: int) -> WebhookPayload:
+    return WebhookPayload.model_validate({
+        "message_id": f"contention_{i}",
+        "from": "+14155550171",
+        "to": "+14155550100",
+        "ts": f"2025-07-01T10:00:{i % 60:02d}Z",
+        "text": "Contended",
+    })
+
+@pytest.fixture
+def contended_db(db_path, monkeypatch):
+    monkeypatch.setattr(storage, "recent_buffer", RecentBuffer(capacity=0))
+    monkeypatch.setattr(settings, "WRITE_BUSY_TIMEOUT_MS", 1)
+    monkeypatch.setattr(settings, "WRITE_RETRY_DEADLINE_MS", 30000)
+    storage.init_db()
+
+def test_parallel_writers_store_each_message_once(contended_db):
+    inserted = Counter()
+    errors = []
+    lock = threading.Lock()
+
+    def writer(seed: int):
+        ids = list(range(MESSAGES))
+        random.Random(seed).shuffle(ids)
+        for i in ids:
+            try:
+                ok, error = storage.store_message(make_payload(i))
+            except Exception as e:
+                ok, error = False, repr(e)
+            with lock:
+                if ok:
+                    inserted[i] += 1
+                elif error:
+                    errors.append(error)
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert inserted == Counter({i: 1 for i in range(MESSAGES)})
+    with storage.get_db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == MESSAGES
+        assert conn.execute("SELECT SUM(message_count) FROM conversations").fetchone()[0] == MESSAGES
+
+def test_store_message_gives_up_at_deadline(contended_db, monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_RETRY_DEADLINE_MS", 50)
+    blocker = sqlite3.connect(storage.db_path)
+    blocker.execute("BEGIN EXCLUSIVE")
+    try:
+        with pytest.raises(storage.StorageBusyError):
+            storage.store_message(make_payload(0))
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+def test_webhook_returns_503_when_locked(monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_RETRY_DEADLINE_MS", 50)
+    body = json.dumps({
+        "message_id": "contention_locked",
+        "from": "+14155550171",
+        "to": "+14155550100",
+        "ts": "2025-07-01T11:00:00Z",
+        "text": "Locked",
+    }).encode()
+    headers = {"X-Signature": generate_signature(body, SECRET), "Content-Type": "application/json"}
+
+    blocker = sqlite3.connect(storage.db_path)
+    blocker.execute("BEGIN EXCLUSIVE")
+    try:
+        response = client.post("/webhook", content=body, headers=headers)
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    response = client.post("/webhook", content=body, headers=headers)
+    assert response.status_code == 200
@@ -0,0 +1,134 @@
+import pytest
+import hmac
+import hashlib
+import json
+import sqlite3
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app import storage
+
+client = TestClient(app)
+SECRET = settings.WEBHOOK_SECRET or "testsecret"
+settings.WEBHOOK_SECRET = SECRET
+
+ALICE = "+14155550131"
+BOB = "+14155550132"
+CAROL = "+14155550133"
+
+def generate_signature(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+@pytest.fixture
+def seed_conversation():
+    messages = [
+        {"message_id": "conv_1", "from": ALICE, "to": BOB, "ts": "2025-03-01T10:00:00Z", "text": "Hi Bob"},
+        {"message_id": "conv_2", "from": BOB, "to": ALICE, "ts": "2025-03-01T10:05:00Z", "text": "Hi Alice"},
+        {"message_id": "conv_3", "from": ALICE, "to": BOB, "ts": "2025-03-01T10:10:00Z", "text": "How are you?"},
+        {"message_id": "conv_4", "from": ALICE, "to": CAROL, "ts": "2025-03-01T09:00:00Z", "text": "Hi Carol"},
+    ]
+    for msg in messages:
+        body = json.dumps(msg).encode()
+        sig = generate_signature(body, SECRET)
+        client.post("/webhook", content=body, headers={"X-Signature": sig, "Content-Type": "application/json"})
+
+def test_conversation_thread(seed_conversation):
+    response = client.get(f"/conversations/{BOB}/{ALICE}/messages")
+    assert response.status_code == 200
+    data = response.json()
+    assert [m["message_id"] for m in data["data"]] == ["conv_1", "conv_2", "conv_3"]
+    assert data["next_cursor"] is None
+
+def test_conversation_thread_keyset_pagination(seed_conversation):
+    response = client.get(f"/conversations/{ALICE}/{BOB}/messages?limit=2")
+    page = response.json()
+    assert [m["message_id"] for m in page["data"]] == ["conv_1", "conv_2"]
+    assert page["next_cursor"]
+
+    response = client.get(f"/conversations/{ALICE}/{BOB}/messages?limit=2&cursor={page['next_cursor']}")
+    assert [m["message_id"] for m in response.json()["data"]] == ["conv_3"]
+
+def test_thread_metrics_labelled_by_route(seed_conversation):
+    client.get(f"/conversations/{ALICE}/{CAROL}/messages")
+    client.get("/no-such-path")
+    metrics = client.get("/metrics").text
+    assert 'http_requests_total{path="/conversations/{a}/{b}/messages",status="200"}' in metrics
+    assert 'http_requests_total{path="unmatched",status="404"}' in metrics
+    assert ALICE not in metrics
+
+def test_fractional_seconds_ordered_by_instant():
+    # As ISO text "10:00:00.500Z" < "10:00:00.900Z" < "10:00:00Z"; as instants b < a < c.
+    sender, recipient = "+14155550134", "+14155550135"
+    for message_id, ts in (("frac_a", "2025-03-02T10:00:00.500Z"), ("frac_b", "2025-03-02T10:00:00Z"), ("frac_c", "2025-03-02T10:00:00.900Z")):
+        body = json.dumps({"message_id": message_id, "from": sender, "to": recipient, "ts": ts, "text": "Hi"}).encode()
+        client.post("/webhook", content=body, headers={"X-Signature": generate_signature(body, SECRET), "Content-Type": "application/json"})
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/conversations/{sender}/{recipient}/messages", params=params).json()
+        seen += [m["message_id"] for m in page["data"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == ["frac_b", "frac_a", "frac_c"]
+
+    conversations = {tuple(c["participants"]): c for c in client.get("/conversations?limit=100").json()["data"]}
+    assert conversations[(sender, recipient)]["last_message"]["message_id"] == "frac_c"
+
+def test_list_conversations(seed_conversation):
+    response = client.get("/conversations?limit=100")
+    assert response.status_code == 200
+    conversations = {tuple(c["participants"]): c for c in response.json()["data"]}
+
+    thread = conversations[storage.conversation_key(ALICE, BOB)]
+    assert thread["message_count"] == 3
+    assert thread["last_message"]["message_id"] == "conv_3"
+    assert conversations[storage.conversation_key(ALICE, CAROL)]["last_message"]["message_id"] == "conv_4"
+
+def test_invalid_cursor():
+    response = client.get("/conversations?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+def test_backfill_conversations(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE messages (
+            message_id TEXT PRIMARY KEY, from_msisdn TEXT NOT NULL, to_msisdn TEXT NOT NULL,
+            ts TEXT NOT NULL, text TEXT, created_at TEXT NOT NULL
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO messages VALUES (?, ?, ?, ?, NULL, '')",
+        [("b1", ALICE, BOB, "2025-01-01T00:00:00Z"), ("b2", BOB, ALICE, "2025-01-02T00:00:00Z")]
+    )
+    conn.commit()
+    conn.close()
+
+    storage.init_db()
+
+    rows, _ = storage.get_conversations(10, None)
+    assert len(rows) == 1
+    assert rows[0]["message_count"] == 2
+    assert rows[0]["message_id"] == "b2"
+
+def test_backfill_repicks_latest_by_instant(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE messages (
+            message_id TEXT PRIMARY KEY, from_msisdn TEXT NOT NULL, to_msisdn TEXT NOT NULL,
+            ts TEXT NOT NULL, text TEXT, created_at TEXT NOT NULL
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO messages VALUES (?, ?, ?, ?, NULL, '')",
+        [("f1", ALICE, BOB, "2025-01-01T00:00:00.500Z"), ("f2", BOB, ALICE, "2025-01-01T00:00:00Z")]
+    )
+    conn.commit()
+    conn.close()
+
+    storage.init_db()
+
+    rows, _ = storage.get_conversations(10, None)
+    assert rows[0]["message_id"] == "f1"
+    assert rows[0]["last_ts_ms"] == 1735689600500
@@ -0,0 +1,126 @@
+import shutil
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app import migrations
+from app.backfill import Backfiller, backfiller
+from app import storage
+from app.models import WebhookPayload, iso_to_epoch_ms
+from app.recent import RecentBuffer
+
+client = TestClient(app)
+
+@pytest.fixture
+def legacy_db(db_path, monkeypatch):
+    """
+    A database at schema version 3 (ISO TEXT timestamps only) with a few rows.
+    """
+    with monkeypatch.context() as m:
+        m.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:3])
+        m.setattr(migrations, "BACKFILLS", [])
+        storage.init_db()
+    with storage.get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO messages (message_id, from_msisdn, to_msisdn, ts, text, created_at) VALUES (?, ?, ?, ?, NULL, ?)",
+            [
+                (f"legacy_{i}", "+14155550181", "+14155550100", f"2025-08-01T10:00:0{i}Z", f"2025-08-01T10:00:0{i}.123456Z")
+                for i in range(5)
+            ]
+        )
+        conn.commit()
+
+def test_epoch_ms_backfill_is_chunked_and_resumable(legacy_db):
+    with storage.get_db_connection() as conn:
+        conn.execute("BEGIN")
+        migrations.epoch_ms_columns(conn)
+        conn.execute("PRAGMA user_version = 4")
+        conn.commit()
+        assert migrations.backfill_epoch_ms(conn, 2) == 2
+
+    # Restart picks up where the interrupted backfill stopped.
+    storage.init_db()
+
+    with storage.get_db_connection() as conn:
+        assert migrations.get_version(conn) == migrations.LATEST_VERSION
+        rows = conn.execute("SELECT ts, ts_ms, created_at, created_at_ms FROM messages ORDER BY rowid").fetchall()
+    assert len(rows) == 5
+    for row in rows:
+        assert row["ts_ms"] == iso_to_epoch_ms(row["ts"])
+        assert row["created_at_ms"] == iso_to_epoch_ms(row["created_at"])
+
+def test_iso_to_epoch_ms():
+    assert iso_to_epoch_ms("1970-01-01T00:00:00Z") == 0
+    assert iso_to_epoch_ms("2025-01-15T10:00:00.5Z") == 1736935200500
+    assert iso_to_epoch_ms("2025-01-15T10:00:00.123456789Z") == 1736935200123
+    assert iso_to_epoch_ms("2025-01-15T12:00:00+02:00") == iso_to_epoch_ms("2025-01-15T10:00:00Z")
+    with pytest.raises(ValueError):
+        iso_to_epoch_ms("yesterday")
+
+def test_ts_validator_matches_epoch_parser():
+    for ts in ("2025-01-15T10:00:00.5Z", "2025-01-15T10:00:00.12Z", "2025-01-15T10:00:00.123456789Z"):
+        payload = WebhookPayload.model_validate({"message_id": "iso", "from": "+14155550181", "to": "+14155550100", "ts": ts})
+        assert iso_to_epoch_ms(payload.ts) // 1000 == 1736935200
+
+def test_messages_invalid_since():
+    response = client.get("/messages", params={"since": "yesterday"})
+    assert response.status_code == 400
+
+def test_numbers_are_stored_once(legacy_db, monkeypatch):
+    monkeypatch.setattr(storage, "recent_buffer", RecentBuffer(capacity=0))
+    storage.init_db()
+    with storage.get_db_connection() as conn:
+        numbers = conn.execute("SELECT msisdn FROM numbers ORDER BY msisdn").fetchall()
+        assert [row["msisdn"] for row in numbers] == ["+14155550100", "+14155550181"]
+        from_ids = {row[0] for row in conn.execute("SELECT from_id FROM messages")}
+        assert from_ids == {storage.lookup_number_id(conn, "+14155550181")}
+
+    rows, total = storage.get_messages(10, 0, "+14155550181", None, None)
+    assert total == 5
+    assert rows[0]["from_msisdn"] == "+14155550181"
+    assert rows[0]["to_msisdn"] == "+14155550100"
+    assert storage.get_messages(10, 0, "+10000000000", None, None) == ([], 0)
+
+def test_rebuild_refused_without_disk_space(legacy_db, monkeypatch):
+    monkeypatch.setattr(shutil, "disk_usage", lambda path: SimpleNamespace(free=0))
+    with pytest.raises(RuntimeError, match="MB free"):
+        storage.init_db()
+    with storage.get_db_connection() as conn:
+        assert migrations.get_version(conn) == 4
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 5
+
+def test_ingest_seq_backfilled_from_rowid(legacy_db):
+    storage.init_db()
+    with storage.get_db_connection() as conn:
+        rows = conn.execute("SELECT rowid, seq FROM messages ORDER BY rowid").fetchall()
+    assert [row["seq"] for row in rows] == [row["rowid"] for row in rows]
+
+def test_backfills_run_in_background(legacy_db):
+    storage.init_db(backfill=False)
+    with storage.get_db_connection() as conn:
+        assert migrations.get_version(conn) == migrations.LATEST_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM messages WHERE ts_ms IS NULL OR seq IS NULL").fetchone()[0] == 5
+
+    # A write accepted before the backfill numbers the old rows must not take one of their seqs.
+    storage.store_message(WebhookPayload.model_validate({
+        "message_id": "during_backfill", "from": "+14155550181", "to": "+14155550100",
+        "ts": "2025-08-01T10:00:09Z", "text": None
+    }))
+
+    completed = []
+    job = Backfiller()
+    job.start(on_complete=[lambda: completed.append(True)])
+    job._thread.join(10)
+    assert job.ready() and completed
+
+    with storage.get_db_connection() as conn:
+        rows = conn.execute("SELECT message_id, seq, ts_ms FROM messages ORDER BY seq").fetchall()
+    assert [row["message_id"] for row in rows][-1] == "during_backfill"
+    assert all(row["ts_ms"] is not None for row in rows)
+    assert len({row["seq"] for row in rows}) == 6
+
+def test_ready_waits_for_backfill(monkeypatch):
+    monkeypatch.setattr(backfiller, "running", True)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["backfill"] is False
@@ -0,0 +1,45 @@
+import itertools
+import pytest
+from app import storage
+from app import migrations
+
+FILTER_COMBINATIONS = [
+    dict(zip(("from_id", "since", "q"), combo))
+    for combo in itertools.product(
+        (None, 1),
+        (None, "2025-01-15T00:00:00Z"),
+        (None, "Hello"),
+    )
+]
+
+def combination_id(filters):
+    return "+".join(k for k, v in filters.items() if v is not None) or "none"
+
+@pytest.fixture
+def conn(fresh_db):
+    with storage.get_db_connection() as conn:
+        yield conn
+
+def query_plan(conn, query, params):
+    return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+def assert_indexed(plan, allow_table_scan=False):
+    for detail in plan:
+        assert "TEMP B-TREE" not in detail, plan
+        if not allow_table_scan:
+            # "SCAN m USING [COVERING] INDEX ..." walks an index in order and stops at LIMIT;
+            # a bare "SCAN m" reads every row of the table.
+            assert not (detail.startswith("SCAN") and "INDEX" not in detail), plan
+
+def test_migrations_recorded(conn):
+    assert migrations.get_version(conn) == migrations.LATEST_VERSION
+
+@pytest.mark.parametrize("filters", FILTER_COMBINATIONS, ids=combination_id)
+def test_messages_query_plans(conn, filters):
+    count_query, data_query, params = storage.build_messages_query(**filters)
+
+    assert_indexed(query_plan(conn, data_query, params + [50, 0]))
+
+    # `text LIKE '%q%'` cannot use an index; without another filter the count must read every row.
+    q_only = filters["q"] and filters["from_id"] is None and not filters["since"]
+    assert_indexed(query_plan(conn, count_query, params), allow_table_scan=q_only)
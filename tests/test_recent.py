@@ -0,0 +1,74 @@
+import itertools
+import random
+import pytest
+from app import storage
+from app.models import WebhookPayload, iso_to_epoch_ms
+from app.recent import RecentBuffer, RecentMessage
+
+SENDERS = ["+14155550161", "+14155550162", "+14155550163"]
+TEXTS = ["Hello world", "HELLO again", "order shipped", None, "café Ünïcode"]
+
+@pytest.fixture
+def buffered_db(fresh_db, monkeypatch):
+    buffer = RecentBuffer(capacity=20)
+    monkeypatch.setattr(storage, "recent_buffer", buffer)
+
+    rng = random.Random(7)
+    for i in range(30):
+        storage.store_message(WebhookPayload.model_validate({
+            "message_id": f"r{i:03d}",
+            "from": rng.choice(SENDERS),
+            "to": "+14155550100",
+            "ts": f"2025-06-01T10:{rng.randrange(60):02d}:00Z",
+            "text": rng.choice(TEXTS),
+        }))
+    storage.preload_recent()
+
+    # Writes after preload go through the ring buffer and evict the oldest entries.
+    for i in range(30, 45):
+        storage.store_message(WebhookPayload.model_validate({
+            "message_id": f"r{i:03d}",
+            "from": rng.choice(SENDERS),
+            "to": "+14155550100",
+            "ts": f"2025-06-01T11:{rng.randrange(60):02d}:00Z",
+            "text": rng.choice(TEXTS),
+        }))
+    return buffer
+
+def sqlite_messages(limit, offset, from_msisdn, since, q):
+    with storage.get_db_connection() as conn:
+        from_id = storage.lookup_number_id(conn, from_msisdn) if from_msisdn else None
+        count_query, data_query, params = storage.build_messages_query(from_id, since, q)
+        total = conn.execute(count_query, params).fetchone()[0]
+        rows = conn.execute(data_query, params + [limit, offset]).fetchall()
+    return [{k: row[k] for k in RecentMessage.FIELDS} for row in rows], total
+
+def test_buffer_matches_sqlite(buffered_db):
+    hits = 0
+    for from_msisdn, since, q, (limit, offset) in itertools.product(
+        [None] + SENDERS,
+        [None, "2025-06-01T10:30:00Z", "2025-06-01T11:00:00Z", "2025-06-01T11:30:00Z"],
+        [None, "hello", "CAFÉ", "ü", "%"],
+        [(50, 0), (3, 2)],
+    ):
+        since_ms = iso_to_epoch_ms(since) if since else None
+        cached = buffered_db.query(limit, offset, from_msisdn, since_ms, q)
+        if cached is None:
+            continue
+        hits += 1
+        rows, total = cached
+        expected_rows, expected_total = sqlite_messages(limit, offset, from_msisdn, since, q)
+        assert total == expected_total
+        assert [dict(row) for row in rows] == expected_rows
+    assert hits > 0
+
+def test_buffer_declines_windows_it_cannot_answer(buffered_db):
+    assert buffered_db.floor is not None
+    assert buffered_db.query(50, 0, None, None, None) is None
+    assert buffered_db.query(50, 0, None, buffered_db.floor[0], None) is None
+    assert buffered_db.query(50, 0, None, iso_to_epoch_ms("2025-06-01T11:00:00Z"), "%") is None
+
+def test_get_messages_served_from_buffer(buffered_db):
+    rows, total = storage.get_messages(50, 0, None, "2025-06-01T11:00:00Z", None)
+    assert total == 15
+    assert [row["message_id"] for row in rows] == [row["message_id"] for row in sqlite_messages(50, 0, None, "2025-06-01T11:00:00Z", None)[0]]
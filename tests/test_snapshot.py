@@ -0,0 +1,110 @@
+import pytest
+import hmac
+import hashlib
+import json
+import sqlite3
+import threading
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.models import WebhookPayload
+from app.recent import RecentBuffer
+from app.snapshot import read_snapshot
+from app import storage
+
+client = TestClient(app)
+SECRET = settings.WEBHOOK_SECRET or "testsecret"
+settings.WEBHOOK_SECRET = SECRET
+
+SENDER = "+14155550141"
+
+def generate_signature(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def post_message(message_id: str, ts: str):
+    msg = {"message_id": message_id, "from": SENDER, "to": "+14155550100", "ts": ts, "text": "Snapshot"}
+    body = json.dumps(msg).encode()
+    sig = generate_signature(body, SECRET)
+    client.post("/webhook", content=body, headers={"X-Signature": sig, "Content-Type": "application/json"})
+
+@pytest.fixture
+def snapshot_enabled(fresh_db, tmp_path, monkeypatch):
+    """
+    Snapshots of a database of the test's own, both under `tmp_path`.
+    """
+    monkeypatch.setattr(read_snapshot, "enabled", True)
+    monkeypatch.setattr(read_snapshot, "path", str(tmp_path / "read.snapshot"))
+    monkeypatch.setattr(read_snapshot, "source_path", fresh_db)
+    monkeypatch.setattr(read_snapshot, "taken_at", None)
+    return read_snapshot
+
+def test_reads_served_from_snapshot(snapshot_enabled):
+    post_message("snap_1", "2025-04-01T10:00:00Z")
+    response = client.get("/messages", params={"from": SENDER})
+    assert "X-Snapshot-Age-Seconds" not in response.headers
+
+    snapshot_enabled.refresh()
+    post_message("snap_2", "2025-04-01T11:00:00Z")
+
+    response = client.get("/messages", params={"from": SENDER})
+    assert float(response.headers["X-Snapshot-Age-Seconds"]) >= 0
+    assert [m["message_id"] for m in response.json()["data"]] == ["snap_1"]
+
+    snapshot_enabled.refresh()
+    response = client.get("/messages", params={"from": SENDER})
+    assert [m["message_id"] for m in response.json()["data"]] == ["snap_1", "snap_2"]
+
+    response = client.get("/stats")
+    assert response.status_code == 200
+    assert "X-Snapshot-Age-Seconds" in response.headers
+
+def test_snapshot_bypasses_recent_buffer(snapshot_enabled, monkeypatch):
+    monkeypatch.setattr(storage, "recent_buffer", RecentBuffer(capacity=100))
+    storage.preload_recent()
+    post_message("snap_b1", "2025-04-03T10:00:00Z")
+    snapshot_enabled.refresh()
+    post_message("snap_b2", "2025-04-03T11:00:00Z")
+
+    # The buffer holds both, but the response must match the snapshot its header describes.
+    response = client.get("/messages", params={"since": "2025-04-03T00:00:00Z"})
+    assert "X-Snapshot-Age-Seconds" in response.headers
+    assert [m["message_id"] for m in response.json()["data"]] == ["snap_b1"]
+
+def test_snapshot_age_metric(snapshot_enabled):
+    snapshot_enabled.refresh()
+    response = client.get("/metrics")
+    assert "read_snapshot_age_seconds" in response.text
+
+def test_refresh_completes_under_writes(snapshot_enabled):
+    stop = threading.Event()
+    started = threading.Event()
+    written = []
+
+    def writer():
+        while not stop.is_set():
+            message_id = f"snap_w{len(written)}"
+            storage.store_message(WebhookPayload.model_validate({
+                "message_id": message_id, "from": SENDER, "to": "+14155550100",
+                "ts": "2025-04-02T10:00:00Z", "text": "Concurrent"
+            }))
+            written.append(message_id)
+            if len(written) == 20:
+                started.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        assert started.wait(10)
+        for _ in range(3):
+            snapshot_enabled.refresh()
+        copied = len(written)
+    finally:
+        stop.set()
+        thread.join()
+
+    conn = sqlite3.connect(snapshot_enabled.path)
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM messages WHERE message_id LIKE 'snap_w%'").fetchone()[0]
+    finally:
+        conn.close()
+    assert 20 <= count <= copied
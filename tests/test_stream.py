@@ -0,0 +1,85 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app import storage
+from app.main import message_stream
+from app.models import WebhookPayload
+from app.pubsub import Subscriber
+
+SENDER = "+14155550151"
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+def make_payload(message_id: str, sender: str = SENDER) -> WebhookPayload:
+    return WebhookPayload.model_validate({
+        "message_id": message_id,
+        "from": sender,
+        "to": "+14155550100",
+        "ts": "2025-05-01T10:00:00Z",
+        "text": "Streamed",
+    })
+
+def parse_event(chunk: str):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return int(fields["id"]), json.loads(fields["data"])
+
+def test_stream_replays_gap_then_follows_live(fresh_db):
+    storage.store_message(make_payload("stream_0"))
+    storage.store_message(make_payload("stream_1"))
+
+    async def run():
+        stream = message_stream(FakeRequest(), SENDER, last_event_id=0)
+        replayed = [parse_event(await stream.__anext__()) for _ in range(2)]
+
+        storage.store_message(make_payload("stream_other", sender="+14155550152"))
+        storage.store_message(make_payload("stream_2"))
+        live = parse_event(await asyncio.wait_for(stream.__anext__(), 5))
+
+        await stream.aclose()
+        return replayed, live
+
+    replayed, live = asyncio.run(run())
+    assert [seq for seq, _ in replayed] == [1, 2]
+    assert replayed[1] == (2, {"message_id": "stream_1", "from": SENDER, "to": "+14155550100", "ts": "2025-05-01T10:00:00Z", "text": "Streamed"})
+    assert live[0] == 4
+    assert live[1]["message_id"] == "stream_2"
+
+def test_slow_consumer_overflow():
+    async def run():
+        subscriber = Subscriber(asyncio.get_running_loop(), None, max_buffer=1)
+        subscriber.offer({"seq": 1})
+        subscriber.offer({"seq": 2})
+        return subscriber
+
+    subscriber = asyncio.run(run())
+    assert subscriber.overflowed
+    assert list(subscriber.buffer) == [{"seq": 1}]
+
+def test_concurrent_writers_stream_in_seq_order(fresh_db):
+    sender, writers, per_writer = "+14155550153", 8, 50
+
+    def write(worker: int):
+        for i in range(per_writer):
+            storage.store_message(make_payload(f"stream_c{worker}_{i}", sender=sender))
+
+    async def run():
+        stream = message_stream(FakeRequest(), sender, last_event_id=None)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)  # subscribed before anything is written
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(writers) as pool:
+            await asyncio.gather(*(loop.run_in_executor(pool, write, worker) for worker in range(writers)))
+
+        seqs = [parse_event(await asyncio.wait_for(first, 5))[0]]
+        while len(seqs) < writers * per_writer:
+            seqs.append(parse_event(await asyncio.wait_for(stream.__anext__(), 5))[0])
+        await stream.aclose()
+        return seqs
+
+    seqs = asyncio.run(run())
+    assert seqs == sorted(seqs)
+    assert len(set(seqs)) == writers * per_writer
@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.logging_utils import logger
+from app.recent import RecentBuffer
+from app.tracing import QueryTrace, current_trace
+from app import storage
+
+client = TestClient(app)
+
+@pytest.fixture
+def no_recent_buffer(monkeypatch):
+    monkeypatch.setattr(storage, "recent_buffer", RecentBuffer(capacity=0))
+
+def parse_server_timing(header):
+    entries = {}
+    for entry in header.split(", "):
+        name, *params = entry.split(";")
+        entries[name] = dict(param.split("=", 1) for param in params)
+    return entries
+
+def test_messages_server_timing(no_recent_buffer):
+    response = client.get("/messages", params={"limit": 5})
+    assert response.status_code == 200
+
+    timing = parse_server_timing(response.headers["Server-Timing"])
+    # COUNT and the data query, then everything else.
+    assert list(timing) == ["db", "sql-1", "sql-2", "app"]
+    assert timing["db"]["desc"] == '"2 queries"'
+    assert timing["sql-1"]["desc"] == '"1 rows"'
+    assert float(timing["db"]["dur"]) == pytest.approx(
+        float(timing["sql-1"]["dur"]) + float(timing["sql-2"]["dur"]), abs=0.02
+    )
+
+def test_trace_records_statements(no_recent_buffer):
+    trace = QueryTrace("trace-test")
+    token = current_trace.set(trace)
+    try:
+        storage.get_messages(5, 0, None, None, None)
+    finally:
+        current_trace.reset(token)
+
+    count, data = trace.queries
+    assert count.sql == "SELECT COUNT(*) FROM messages m WHERE 1=1"
+    assert count.rows == 1
+    assert data.sql.startswith("SELECT m.message_id, nf.msisdn AS from_msisdn")
+    assert 0 < data.rows <= 5
+
+def test_slow_query_log(no_recent_buffer, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 1e-6)
+    records = []
+    monkeypatch.setattr(logger, "warning", lambda msg, *args, **kwargs: records.append(msg))
+
+    response = client.get("/stats", headers={"X-Request-ID": "slow-1"})
+    assert response.status_code == 200
+
+    slow = [r for r in records if r.get("event") == "slow_query"]
+    assert slow and all(r["request_id"] == "slow-1" for r in slow)
+    by_sql = {r["sql"]: r for r in slow}
+    assert by_sql["SELECT COUNT(*) FROM messages"]["rows"] == 1
+    assert any("messages" in detail for detail in by_sql["SELECT COUNT(*) FROM messages"]["plan"])
+
+def test_slow_query_logged_before_close(fresh_db, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 1e-6)
+    records = []
+    monkeypatch.setattr(logger, "warning", lambda msg, *args, **kwargs: records.append(msg))
+
+    with storage.get_db_connection() as conn:
+        # A long-lived connection, like the backfill's: each statement is logged
+        # once it finishes, and nothing piles up on the connection.
+        for n in range(100):
+            conn.execute("SELECT COUNT(*) FROM messages WHERE ts_ms > ?", (n,)).fetchall()
+            assert conn.pending is None
+        assert len(records) == 100
+
+        cursor = conn.execute("SELECT message_id FROM messages")
+        assert conn.pending is not None and len(records) == 100
+        list(cursor)
+        assert conn.pending is None and len(records) == 101
+    assert len(records) == 101
+    assert records[0]["sql"] == "SELECT COUNT(*) FROM messages WHERE ts_ms > ?"
+    assert records[0]["plan"]
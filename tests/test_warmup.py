@@ -0,0 +1,38 @@
+import sys
+from fastapi.testclient import TestClient
+from app.main import app
+from app.warmup import Warmup, warmup, parse_country_codes
+from app import storage
+
+client = TestClient(app)
+
+def test_ready_waits_for_warmup(monkeypatch):
+    monkeypatch.setattr(warmup, "running", True)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["warmup"] is False
+
+    monkeypatch.setattr(warmup, "running", False)
+    assert client.get("/health/ready").status_code == 200
+
+def test_warmup_steps():
+    job = Warmup(enabled=True, country_codes=parse_country_codes("1, 91,800"), db_rows=100)
+    job.start()
+    job._thread.join(30)
+    assert job.ready()
+
+    # Every region sharing +1 is loaded, not just the US.
+    assert "phonenumbers.data.region_CA" in sys.modules
+    assert "phonenumbers.data.region_IN" in sys.modules
+    assert "phonenumbers.data.region_800" in sys.modules
+
+    metrics = client.get("/metrics").text
+    for step in ("phonenumbers", "validators", "serializers", "db_cache"):
+        assert f'warmup_step_seconds{{step="{step}"}}' in metrics
+
+def test_prime_db_cache_fills_number_cache():
+    with storage.get_db_connection() as conn:
+        numbers = conn.execute("SELECT msisdn, id FROM numbers").fetchall()
+    storage.number_cache().clear()
+    storage.prime_db_cache(10)
+    assert all(storage.number_cache()[msisdn] == number_id for msisdn, number_id in numbers)
@@ -5,6 +5,15 @@ import json
 from fastapi.testclient import TestClient
 from app.main import app
 from app.config import settings
+from app.db_monitor import db_monitor
+from app.main import startup_event
+from app.signing import KeyRegistry
+from app.snapshot import read_snapshot
+from app.recompress import text_recompressor
+from app.warmup import warmup
+from app.backfill import backfiller
+from app import storage
+from app import metrics
 
 client = TestClient(app)
 SECRET = settings.WEBHOOK_SECRET or "testsecret"
@@ -18,6 +27,45 @@ def test_health_live():
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
+def test_health_ready():
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+def test_health_ready_degraded(monkeypatch):
+    monkeypatch.setattr(db_monitor, "degraded_latency_ms", -1)
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+
+    monkeypatch.setattr(db_monitor, "unready_latency_ms", -1)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+
+def test_db_monitor_metrics():
+    db_monitor.probe()
+    db_monitor.collect()
+    response = client.get("/metrics")
+    assert "db_probe_latency_ms" in response.text
+    assert "db_file_size_bytes" in response.text
+
+def test_db_monitor_wal_metrics():
+    # An open connection keeps the WAL file around, as concurrent traffic does.
+    with storage.get_db_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.execute("INSERT OR IGNORE INTO numbers (msisdn) VALUES ('+14155550199')")
+        conn.execute("UPDATE numbers SET msisdn = msisdn WHERE msisdn = '+14155550199'")
+        conn.commit()
+        db_monitor.collect()
+    samples = {
+        sample.name: sample.value
+        for metric in (metrics.DB_WAL_SIZE_BYTES, metrics.DB_CHECKPOINT_SECONDS)
+        for sample in metric.collect()[0].samples
+    }
+    assert samples["db_wal_size_bytes"] > 0
+    assert samples["db_checkpoint_seconds_count"] > 0
+
 def test_webhook_success():
     payload = {
         "message_id": "test_m1",
@@ -101,3 +149,88 @@ def test_webhook_validation_error():
         headers={"X-Signature": sig, "Content-Type": "application/json"}
     )
     assert response.status_code == 422
+
+def test_webhook_rotated_secret(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_SECRETS", "next:nextsecret")
+    payload = {
+        "message_id": "test_rot1",
+        "from": "+919876543210",
+        "to": "+14155550100",
+        "ts": "2025-02-01T10:00:00Z",
+        "text": "Rotated"
+    }
+    body = json.dumps(payload).encode()
+    sig = generate_signature(body, "nextsecret")
+
+    response = client.post(
+        "/webhook",
+        content=body,
+        headers={"X-Signature": sig, "Content-Type": "application/json"}
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        "/webhook",
+        content=body,
+        headers={"X-Signature": sig, "X-Signature-Key-Id": "next", "Content-Type": "application/json"}
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        "/webhook",
+        content=body,
+        headers={"X-Signature": sig, "X-Signature-Key-Id": "default", "Content-Type": "application/json"}
+    )
+    assert response.status_code == 401
+
+def test_malformed_secret_entry_skipped(db_path, monkeypatch):
+    registry = KeyRegistry.from_config(SECRET, "next:nextsecret,no-separator,empty:, :nokey")
+    assert [key.key_id for key in registry.keys] == ["default", "next"]
+
+    monkeypatch.setattr(settings, "WEBHOOK_SECRETS", "next:nextsecret,no-separator")
+    for job in (read_snapshot, db_monitor, text_recompressor, backfiller, warmup):
+        monkeypatch.setattr(job, "start", lambda *args, **kwargs: None)
+    startup_event()
+
+    assert client.get("/health/ready").status_code == 200
+    payload = {
+        "message_id": "test_bad_entry",
+        "from": "+919876543210",
+        "to": "+14155550100",
+        "ts": "2025-02-01T10:00:00Z",
+        "text": "Still accepted"
+    }
+    body = json.dumps(payload).encode()
+    response = client.post(
+        "/webhook",
+        content=body,
+        headers={"X-Signature": generate_signature(body, "nextsecret"), "Content-Type": "application/json"}
+    )
+    assert response.status_code == 200
+
+def test_debug_endpoints_disabled_by_default():
+    assert client.get("/debug/profile?seconds=1").status_code == 404
+    assert client.get("/debug/tasks").status_code == 404
+
+def test_debug_profile(monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG_ENDPOINTS_ENABLED", True)
+    monkeypatch.setattr(settings, "DEBUG_TOKEN", "debugtoken")
+    assert client.get("/debug/tasks").status_code == 403
+
+    headers = {"X-Debug-Token": "debugtoken"}
+    response = client.get("/debug/profile?seconds=0.2", headers=headers)
+    assert response.status_code == 200
+    for line in response.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+
+    response = client.get("/debug/tasks", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["count"] >= 1
+
+def test_request_id_propagated():
+    response = client.get("/health/live", headers={"X-Request-ID": "req-123"})
+    assert response.headers["X-Request-ID"] == "req-123"
+
+    response = client.get("/health/live")
+    assert response.headers["X-Request-ID"]